@@ -13,15 +13,60 @@ const getAuthHeader = () => {
   return { Authorization: `Bearer ${token}` };
 };
 
+const clearTokens = () => {
+  localStorage.removeItem("token");
+  localStorage.removeItem("refresh_token");
+};
+
+// -------------------------
+// Refresh-on-401
+// -------------------------
+// Access tokens are short-lived: on a 401 we swap the refresh token for a
+// new pair once and replay the request. Concurrent 401s share one refresh.
+const AUTH_PATHS = ["/users/login", "/users/refresh", "/users/logout"];
+let refreshing: Promise<string | null> | null = null;
+
+const refreshTokens = (): Promise<string | null> => {
+  const refreshToken = localStorage.getItem("refresh_token");
+  if (!refreshToken) return Promise.resolve(null);
+  if (!refreshing) {
+    refreshing = axios
+      .post(`${API_BASE}/users/refresh`, { refresh_token: refreshToken })
+      .then((res) => {
+        localStorage.setItem("token", res.data.access_token);
+        localStorage.setItem("refresh_token", res.data.refresh_token);
+        return res.data.access_token as string;
+      })
+      .catch(() => null)
+      .finally(() => {
+        refreshing = null;
+      });
+  }
+  return refreshing;
+};
+
+axios.interceptors.response.use(undefined, async (error) => {
+  const config = error.config;
+  const isAuthCall = AUTH_PATHS.some((path) => config?.url?.includes(path));
+  if (error.response?.status !== 401 || !config || config._retried || isAuthCall) {
+    throw error;
+  }
+  const token = await refreshTokens();
+  if (!token) throw error;
+  config._retried = true;
+  config.headers = { ...config.headers, Authorization: `Bearer ${token}` };
+  return axios(config);
+});
+
 // -------------------------
 // Handle API errors
 // -------------------------
 const handleApiError = (error: any) => {
   if (axios.isAxiosError(error)) {
-    // If the server returns a 401, force the user to log out and redirect
+    // Still 401 after trying to refresh: force the user to log in again
     if (error.response?.status === 401) {
       alert("Your session has expired. Please log in again.");
-      localStorage.removeItem("token");
+      clearTokens();
       window.location.href = "/login";
     }
   }
@@ -49,12 +94,28 @@ export const loginUser = async (data: { email: string; password: string }) => {
   try {
     const res = await axios.post(`${API_BASE}/users/login`, data);
     localStorage.setItem("token", res.data.access_token);
+    localStorage.setItem("refresh_token", res.data.refresh_token);
     return res.data;
   } catch (error) {
     handleApiError(error);
   }
 };
 
+// Revokes the refresh token server-side, then forgets both tokens locally
+export const logoutUser = async () => {
+  try {
+    await axios.post(
+      `${API_BASE}/users/logout`,
+      { refresh_token: localStorage.getItem("refresh_token") },
+      { headers: getAuthHeader() },
+    );
+  } catch (error) {
+    console.error("Logout request failed:", error);
+  } finally {
+    clearTokens();
+  }
+};
+
 export const getCurrentUser = async () => {
   try {
     const res = await axios.get(`${API_BASE}/users/me`, {
@@ -76,6 +137,11 @@ export const saveOnboardingData = async (onboardingData: any) => {
       onboardingData,
       { headers: getAuthHeader() },
     );
+    // The old token still claims the user isn't onboarded; swap in the new pair
+    if (res.data.access_token) {
+      localStorage.setItem("token", res.data.access_token);
+      localStorage.setItem("refresh_token", res.data.refresh_token);
+    }
     return res.data;
   } catch (error: any) {
     throw error;
@@ -91,28 +157,81 @@ export const getAnalytics = async () => {
   }
 };
 
+// Applies a /api/events delta: JSON Merge Patch, plus {$points, $len} for
+// timeseries (upsert points by time, keep the newest $len)
+const applyPatch = (target: any, patch: any): any => {
+  if (patch === null || typeof patch !== "object" || Array.isArray(patch)) {
+    return patch;
+  }
+  if ("$points" in patch) {
+    const merged = new Map<string, any>();
+    for (const p of Array.isArray(target) ? target : []) merged.set(p.time, p);
+    for (const p of patch.$points) merged.set(p.time, p);
+    const points = [...merged.values()].sort((a, b) =>
+      a.time < b.time ? -1 : a.time > b.time ? 1 : 0,
+    );
+    return points.slice(Math.max(0, points.length - patch.$len));
+  }
+  const result =
+    target && typeof target === "object" && !Array.isArray(target)
+      ? { ...target }
+      : {};
+  for (const [key, value] of Object.entries(patch)) {
+    if (value === null) delete result[key];
+    else result[key] = applyPatch(result[key], value);
+  }
+  return result;
+};
+
 export const subscribeToEvents = (
   onMessage: (data: any) => void,
   onError?: (err: any) => void,
 ) => {
-  const es = new EventSource(`${API_BASE}/api/events`);
-
-  es.onmessage = (event) => {
-    try {
-      const data = JSON.parse(event.data);
-      onMessage(data);
-    } catch (err) {
-      console.error("Invalid SSE data", err);
-    }
-  };
+  let es: EventSource;
+  let state: any = null;
+  let seq = 0;
+
+  const connect = () => {
+    es = new EventSource(`${API_BASE}/api/events`);
+
+    es.addEventListener("snapshot", (event: MessageEvent) => {
+      try {
+        const frame = JSON.parse(event.data);
+        state = frame.data;
+        seq = frame.seq;
+        onMessage(state);
+      } catch (err) {
+        console.error("Invalid SSE data", err);
+      }
+    });
+
+    es.addEventListener("delta", (event: MessageEvent) => {
+      try {
+        const frame = JSON.parse(event.data);
+        if (state === null || frame.seq !== seq + 1) {
+          // Missed a frame: reconnect without Last-Event-ID for a snapshot
+          es.close();
+          state = null;
+          connect();
+          return;
+        }
+        state = applyPatch(state, frame.patch);
+        seq = frame.seq;
+        onMessage(state);
+      } catch (err) {
+        console.error("Invalid SSE data", err);
+      }
+    });
 
-  es.onerror = (err) => {
-    console.warn("SSE connection error", err);
-    if (onError) onError(err);
-    es.close();
+    es.onerror = (err) => {
+      console.warn("SSE connection error", err);
+      if (onError) onError(err);
+      es.close();
+    };
   };
 
-  return es;
+  connect();
+  return { close: () => es.close() };
 };
 
 // -------------------------
@@ -25,7 +25,7 @@ import {
 } from "lucide-react";
 import { useLocation, useNavigate } from "react-router-dom";
 // Assuming you implement this function in src/api.ts
-import { askAiForReport } from "../api";
+import { askAiForReport, logoutUser } from "../api";
 
 // -------------------- Types --------------------
 type ScanPoint = { ts: string; score: number };
@@ -1838,10 +1838,9 @@ export const DashboardDeep = () => {
   };
 
   // -------------------- Logout --------------------
-  const logout = () => {
+  const logout = async () => {
     if (!confirm("Log out?")) return;
-    // FIX: Changed "user" to "token" to match your App.tsx
-    localStorage.removeItem("token");
+    await logoutUser();
     localStorage.removeItem("account_is_pro");
     setIsProUser(false);
     navigate("/login");
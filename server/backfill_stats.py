@@ -0,0 +1,20 @@
+# Rebuilds the per-user rollup documents (user_stats) from seo_reports.
+# Usage: python backfill_stats.py [user_id]
+import asyncio
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database import rebuild_user_stats
+
+
+async def main():
+    user_id = sys.argv[1] if len(sys.argv) > 1 else None
+    rebuilt = await rebuild_user_stats(user_id)
+    print(f"✅ Rebuilt stats for {rebuilt} user(s).")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,11 +1,21 @@
+import asyncio
+import hashlib
 import os
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import pymongo
-from bson import ObjectId
+from bson import Binary, ObjectId
 from dotenv import load_dotenv  # Import load_dotenv
-from pymongo.collection import Collection
+from motor.motor_asyncio import (
+    AsyncIOMotorClient,
+    AsyncIOMotorCollection,
+    AsyncIOMotorGridFSBucket,
+)
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from utils.pagination import keyset_filter
+from utils.report_codec import compress_detail, decompress_detail, summarize_report
+from utils.user_cache import invalidate_user
 
 # --- Database Connection ---
 load_dotenv()  # Load environment variables from .env
@@ -13,51 +23,163 @@ load_dotenv()  # Load environment variables from .env
 # ✨ FIX: Use "MONGO_URI" from your .env file
 # Provides a fallback to localhost if MONGO_URI is not found
 MONGO_URI = os.getenv("MONGO_URI")
-CLIENT = pymongo.MongoClient(MONGO_URI)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "5000"))
+
+# Motor keeps a connection pool per process; every call below is awaited so
+# a database round trip never blocks the event loop.
+CLIENT = AsyncIOMotorClient(
+    MONGO_URI,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+)
 DB = CLIENT["seotron_db"]
 
+DUPLICATE_KEY = 11000
+
 # --- Collections ---
-users_collection: Collection = DB["users"]
-reports_collection: Collection = DB["seo_reports"]
-onboarding_collection: Collection = DB["onboarding"]
+users_collection: AsyncIOMotorCollection = DB["users"]
+reports_collection: AsyncIOMotorCollection = DB["seo_reports"]
+onboarding_collection: AsyncIOMotorCollection = DB["onboarding"]
+analysis_cache_collection: AsyncIOMotorCollection = DB["analysis_cache"]
+user_stats_collection: AsyncIOMotorCollection = DB["user_stats"]
+refresh_tokens_collection: AsyncIOMotorCollection = DB["refresh_tokens"]
+revoked_tokens_collection: AsyncIOMotorCollection = DB["revoked_tokens"]
+analytics_snapshots_collection: AsyncIOMotorCollection = DB["analytics_snapshots"]
+analysis_jobs_collection: AsyncIOMotorCollection = DB["analysis_jobs"]
+site_crawls_collection: AsyncIOMotorCollection = DB["site_crawls"]
+crawl_pages_collection: AsyncIOMotorCollection = DB["crawl_pages"]
 
 
-def create_db_and_tables():
-    """Creates collections on startup if they don't exist."""
-    try:
-        DB.create_collection("users")
-        # Create a unique index for user emails
-        users_collection.create_index("email", unique=True)
-    except pymongo.errors.CollectionInvalid:
-        pass  # Collection already exists
+# --- Index Registry ---
+# Every index the app relies on, per collection. Applied idempotently at
+# startup; names are left to MongoDB's defaults (e.g. "email_1") so indexes
+# created by earlier versions are recognised as the same index.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "seo_reports": [
+        # Dashboard/history: one user's reports, newest first
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        # History of a single URL across audits
+        IndexModel([("url", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "onboarding": [
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    # user_stats is keyed by user _id, so it needs no extra index
+    "user_stats": [],
+    "refresh_tokens": [
+        # Reuse detection revokes a whole rotation family at once
+        IndexModel([("family", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "revoked_tokens": [
+        # A revoked access token only matters until it would have expired
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    # One rollup snapshot per node, keyed by node id
+    "analytics_snapshots": [],
+    "site_crawls": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "crawl_pages": [
+        # Pages of one crawl, newest first (keyset pagination + site report)
+        IndexModel([("crawl_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "analysis_jobs": [
+        # Workers claim the oldest queued (or abandoned) job
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        # Finished jobs are kept for a while, then dropped
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "analysis_cache": [
+        # TTL: MongoDB drops entries once `expires_at` passes
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
 
-    try:
-        DB.create_collection("seo_reports")
-    except pymongo.errors.CollectionInvalid:
-        pass
 
-    try:
-        DB.create_collection("onboarding")
-    except pymongo.errors.CollectionInvalid:
-        pass
+async def ensure_indexes():
+    """Creates any declared index that doesn't exist yet."""
+    for collection_name, indexes in INDEXES.items():
+        if not indexes:
+            continue
+        try:
+            await DB[collection_name].create_indexes(indexes)
+        except pymongo.errors.OperationFailure as e:
+            # Same keys but different options/name: leave it for a human
+            print(f"⚠️ Index conflict on '{collection_name}': {e}")
+
+
+async def check_indexes() -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compares the live indexes with the registry. For each collection reports
+    `missing` (declared, not present), `undeclared` (present, not declared)
+    and `unused` (no recorded accesses since the server last started).
+    """
+    report = {}
+    for collection_name, indexes in INDEXES.items():
+        collection = DB[collection_name]
+        declared = {index.document["name"] for index in indexes}
+        existing = set((await collection.index_information()).keys()) - {"_id_"}
+
+        unused = []
+        try:
+            async for stat in collection.aggregate([{"$indexStats": {}}]):
+                if stat["name"] != "_id_" and stat["accesses"]["ops"] == 0:
+                    unused.append(stat["name"])
+        except pymongo.errors.OperationFailure:
+            pass  # $indexStats needs extra privileges on some hosted tiers
+
+        report[collection_name] = {
+            "missing": sorted(declared - existing),
+            "undeclared": sorted(existing - declared),
+            "unused": sorted(unused),
+        }
+    return report
+
+
+async def create_db_and_tables():
+    """Creates collections and indexes on startup if they don't exist."""
+    existing = set(await DB.list_collection_names())
+    for collection_name in INDEXES:
+        if collection_name not in existing:
+            try:
+                await DB.create_collection(collection_name)
+            except pymongo.errors.CollectionInvalid:
+                pass  # Created concurrently by another worker
+
+    await ensure_indexes()
+
+    for collection_name, status in (await check_indexes()).items():
+        if status["missing"]:
+            print(f"⚠️ Missing indexes on '{collection_name}': {status['missing']}")
     print("Database and collections initialized.")
 
 
+def close_db():
+    CLIENT.close()
+
+
 # --- User Functions ---
 
 
-def get_user_by_email(email: str) -> Optional[dict]:
+async def get_user_by_email(email: str) -> Optional[dict]:
     """Finds a user by their email."""
-    user = users_collection.find_one({"email": email})
+    user = await users_collection.find_one({"email": email})
     if user:
         user["_id"] = str(user["_id"])  # Convert ObjectId to string
     return user
 
 
-def get_user_by_id(user_id: str) -> Optional[dict]:
+async def get_user_by_id(user_id: str) -> Optional[dict]:
     """Finds a user by their string ID."""
     try:
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
         if user:
             user["_id"] = str(user["_id"])  # Convert ObjectId to string
         return user
@@ -65,25 +187,38 @@ def get_user_by_id(user_id: str) -> Optional[dict]:
         return None
 
 
-def create_user(user_data: dict) -> dict:
+async def create_user(user_data: dict) -> dict:
     """Creates a new user and returns them."""
     # Add default fields
     user_data["created_at"] = datetime.now()
     user_data["isOnboarded"] = False
     user_data["plan"] = "Free"
 
-    result = users_collection.insert_one(user_data)
-    new_user = get_user_by_id(str(result.inserted_id))
+    result = await users_collection.insert_one(user_data)
+    # Drop any cached "no such user" state for this email
+    invalidate_user(user_data.get("email"))
+    new_user = await get_user_by_id(str(result.inserted_id))
     return new_user
 
 
-def update_user_onboarding(user_id: str, onboarding_data: dict) -> Optional[dict]:
+async def update_user_password_hash(user_id: str, hashed_password: str):
+    """Replaces a user's password hash (used for cost-factor upgrades)."""
+    user = await users_collection.find_one_and_update(
+        {"_id": ObjectId(user_id)},
+        {"$set": {"hashed_password": hashed_password}},
+        projection={"email": 1},
+    )
+    if user:
+        invalidate_user(user.get("email"))
+
+
+async def update_user_onboarding(user_id: str, onboarding_data: dict) -> Optional[dict]:
     """
     Updates a user's isOnboarded status and saves their onboarding data.
     """
     try:
         # 1. Save the onboarding data to its own collection for cleanliness
-        onboarding_collection.insert_one(
+        await onboarding_collection.insert_one(
             {
                 "user_id": ObjectId(user_id),
                 "data": onboarding_data,
@@ -92,11 +227,14 @@ def update_user_onboarding(user_id: str, onboarding_data: dict) -> Optional[dict
         )
 
         # 2. Update the user's `isOnboarded` flag
-        users_collection.update_one(
+        await users_collection.update_one(
             {"_id": ObjectId(user_id)}, {"$set": {"isOnboarded": True}}
         )
 
-        return get_user_by_id(user_id)
+        updated_user = await get_user_by_id(user_id)
+        if updated_user:
+            invalidate_user(updated_user.get("email"))
+        return updated_user
 
     except Exception as e:
         print(f"Error updating onboarding: {e}")
@@ -104,27 +242,892 @@ def update_user_onboarding(user_id: str, onboarding_data: dict) -> Optional[dict
 
 
 # --- Report Functions ---
+# Reports are split in two: the seo_reports document holds a small summary
+# (scores, counts, title, meta) that every list/dashboard query reads, and
+# the full analysis result is stored as a compressed blob -- inline for
+# typical pages, in GridFS when it is large -- and only decoded when a
+# single report is opened. Reports saved before the split keep a plain
+# `data` field and are still readable.
+REPORT_DETAIL_GRIDFS_KB = int(os.getenv("REPORT_DETAIL_GRIDFS_KB", "512"))
+report_details_bucket = AsyncIOMotorGridFSBucket(DB, bucket_name="report_details")
+
+# Score of a report in aggregation expressions, for both storage layouts
+SCORE_EXPR = {"$ifNull": ["$summary.score", "$data.score"]}
 
 
-def save_seo_report(user_id: str, url: str, data: dict):
-    """Saves a new SEO analysis report."""
-    report = {
+async def _store_report_detail(data: dict, report_id: ObjectId) -> dict:
+    blob, codec = await asyncio.to_thread(compress_detail, data)
+    if len(blob) > REPORT_DETAIL_GRIDFS_KB * 1024:
+        file_id = await report_details_bucket.upload_from_stream(
+            str(report_id), blob, metadata={"report_id": report_id, "codec": codec}
+        )
+        return {"storage": "gridfs", "codec": codec, "file_id": file_id, "size": len(blob)}
+    return {"storage": "inline", "codec": codec, "blob": Binary(blob), "size": len(blob)}
+
+
+async def _load_report_detail(detail: dict) -> dict:
+    if detail["storage"] == "gridfs":
+        stream = await report_details_bucket.open_download_stream(detail["file_id"])
+        blob = await stream.read()
+    else:
+        blob = bytes(detail["blob"])
+    return await asyncio.to_thread(decompress_detail, blob, detail["codec"])
+
+
+async def build_report_document(
+    user_id: str, url: str, data: dict, created_at: Optional[datetime] = None
+) -> dict:
+    """Builds the stored form of a report (summary + compressed detail)."""
+    report_id = ObjectId()
+    return {
+        "_id": report_id,
         "user_id": ObjectId(user_id),  # Use ObjectId
         "url": str(url),
-        "data": data,
+        "summary": summarize_report(data),
+        "detail": await _store_report_detail(data, report_id),
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+async def insert_reports(reports: List[dict]):
+    """
+    Inserts already-built report documents. Safe to retry with the same
+    documents: reports already stored by an earlier attempt are skipped.
+    """
+    if not reports:
+        return
+    try:
+        await reports_collection.insert_many(reports, ordered=False)
+    except pymongo.errors.BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(error.get("code") != DUPLICATE_KEY for error in errors):
+            raise
+
+
+async def apply_report_stats(reports: List[dict]):
+    """
+    Folds stored reports into their users' rollups. Idempotent: each update
+    only matches while the report id is not yet in `applied_ids`, so a
+    retried (or partly applied) batch never counts a report twice.
+    """
+    if not reports:
+        return
+    user_ids = {report["user_id"] for report in reports}
+    # Create missing rollup docs first so the guarded updates need no upsert
+    await user_stats_collection.bulk_write(
+        [
+            UpdateOne(
+                {"_id": user_id},
+                # Incomplete until rebuild_user_stats has folded in the
+                # user's older reports
+                {"$setOnInsert": {"applied_ids": [], "complete": False, "version": 0}},
+                upsert=True,
+            )
+            for user_id in user_ids
+        ],
+        ordered=False,
+    )
+    await user_stats_collection.bulk_write(
+        [
+            UpdateOne(
+                {"_id": report["user_id"], "applied_ids": {"$ne": report["_id"]}},
+                user_stats_update(
+                    report["_id"],
+                    report["url"],
+                    report["summary"].get("score"),
+                    report["created_at"],
+                ),
+            )
+            for report in reports
+        ],
+        ordered=False,
+    )
+
+
+async def get_report_detail(user_id: str, report_id: str) -> Optional[dict]:
+    """
+    Loads one report of a user with its full analysis result under `data`
+    (decompressed on demand). Returns None if it doesn't exist or belongs
+    to someone else.
+    """
+    try:
+        report = await reports_collection.find_one(
+            {"_id": ObjectId(report_id), "user_id": ObjectId(user_id)}
+        )
+    except Exception:
+        return None
+    if not report:
+        return None
+
+    detail = report.pop("detail", None)
+    if detail is not None:
+        report["data"] = await _load_report_detail(detail)
+    report["_id"] = str(report["_id"])
+    report["user_id"] = str(report["user_id"])
+    return report
+
+
+def _report_window(
+    user_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> dict:
+    match: Dict[str, Any] = {"user_id": ObjectId(user_id)}
+    if since or until:
+        match["created_at"] = {}
+        if since:
+            match["created_at"]["$gte"] = since
+        if until:
+            match["created_at"]["$lt"] = until
+    return match
+
+
+async def get_user_report_stats(
+    user_id: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+) -> dict:
+    """Report count and average score, computed inside MongoDB."""
+    pipeline = [
+        {"$match": _report_window(user_id, since, until)},
+        {
+            "$group": {
+                "_id": None,
+                "total_audits": {"$sum": 1},
+                # $avg skips reports without a score, like the old Python loop
+                "average_score": {"$avg": SCORE_EXPR},
+                "min_score": {"$min": SCORE_EXPR},
+                "max_score": {"$max": SCORE_EXPR},
+            }
+        },
+    ]
+    async for row in reports_collection.aggregate(pipeline):
+        return {
+            "total_audits": row["total_audits"],
+            "average_score": row["average_score"] or 0,
+            "min_score": row["min_score"],
+            "max_score": row["max_score"],
+        }
+    return {"total_audits": 0, "average_score": 0}
+
+
+async def get_user_report_latest_scores(user_id: str) -> List[dict]:
+    """Latest score per audited URL, aggregated over the reports (newest first)."""
+    pipeline = [
+        {"$match": {"user_id": ObjectId(user_id)}},
+        {"$sort": {"created_at": -1}},
+        {
+            "$group": {
+                "_id": "$url",
+                "created_at": {"$first": "$created_at"},
+                "score": {"$first": SCORE_EXPR},
+            }
+        },
+        {"$sort": {"created_at": -1}},
+    ]
+    return [
+        _latest_entry(row["_id"], row["score"], row["created_at"])
+        async for row in reports_collection.aggregate(pipeline)
+    ]
+
+
+async def get_user_report_summaries(
+    user_id: str,
+    limit: int = 50,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[Tuple[datetime, ObjectId]] = None,
+) -> List[dict]:
+    """
+    Newest-first url/score/date rows for a user, walking the
+    {user_id, created_at} index. `after` is a keyset position from
+    utils.pagination.decode_cursor.
+    """
+    match = {**_report_window(user_id, since, until), **keyset_filter(after)}
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {"$limit": limit},
+        {
+            "$project": {
+                "url": 1,
+                "created_at": 1,
+                "score": {"$ifNull": [SCORE_EXPR, 0]},
+            }
+        },
+    ]
+    return [row async for row in reports_collection.aggregate(pipeline)]
+
+
+# Fields the report history API can project, for both storage layouts
+REPORT_LIST_FIELDS = {
+    "url": "$url",
+    "title": {"$ifNull": ["$summary.title", "$data.title"]},
+    "score": SCORE_EXPR,
+    "metaTags": {"$ifNull": ["$summary.metaTags", "$data.metaTags"]},
+    "google_scores": {"$ifNull": ["$summary.google_scores", "$data.google_scores"]},
+    "performance": {"$ifNull": ["$summary.performance", "$data.performance"]},
+    "counts": "$summary.counts",
+}
+
+
+async def find_user_reports(
+    user_id: str,
+    fields: List[str],
+    limit: int = 20,
+    after: Optional[Tuple[datetime, ObjectId]] = None,
+    url: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+) -> List[dict]:
+    """
+    One page of a user's report history, newest first, keyset-paginated on
+    (created_at, _id) so every page costs the same walk of the
+    {user_id, created_at} index. Only `fields` (keys of REPORT_LIST_FIELDS)
+    are returned, plus _id and created_at.
+    """
+    conditions: List[dict] = [_report_window(user_id, since, until)]
+    if url:
+        conditions.append({"url": url})
+    if after:
+        conditions.append(keyset_filter(after))
+    if min_score is not None or max_score is not None:
+        score_range: Dict[str, Any] = {}
+        if min_score is not None:
+            score_range["$gte"] = min_score
+        if max_score is not None:
+            score_range["$lte"] = max_score
+        conditions.append(
+            {"$or": [{"summary.score": score_range}, {"data.score": score_range}]}
+        )
+
+    projection: Dict[str, Any] = {"_id": 1, "created_at": 1}
+    projection.update({field: REPORT_LIST_FIELDS[field] for field in fields})
+
+    pipeline = [
+        {"$match": {"$and": conditions}},
+        {"$sort": {"created_at": -1, "_id": -1}},
+        {"$limit": limit},
+        {"$project": projection},
+    ]
+    return [
+        {**report, "_id": str(report["_id"])}
+        async for report in reports_collection.aggregate(pipeline)
+    ]
+
+
+# --- Per-User Rollup Stats ---
+# One small document per user, kept current with atomic $inc/$min/$max on
+# every saved report so the dashboard never has to scan report history.
+SCORE_BUCKETS = 10  # histogram buckets of width 10: 0-9, 10-19, ..., 90-100
+
+
+def _score_bucket(score) -> str:
+    return f"b{min(int(score) // 10, SCORE_BUCKETS - 1)}"
+
+
+# Bumped whenever the rollup gains a field; docs built for an older layout
+# count as incomplete until rebuilt
+STATS_SCHEMA = 2
+
+
+def _stats_complete(doc: Optional[dict]) -> bool:
+    return bool(doc and doc.get("complete") and doc.get("schema") == STATS_SCHEMA)
+
+
+# Ids of the most recently applied reports kept on each rollup doc; a
+# retried batch is always far newer than this many reports back
+STATS_APPLIED_KEEP = 500
+
+
+def _url_key(url: str) -> str:
+    # URLs contain dots, which MongoDB update paths treat as nesting
+    return hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]
+
+
+def _latest_entry(url: str, score, created_at: datetime) -> dict:
+    # created_at goes first: $max compares embedded documents field by field,
+    # so a late (retried) older report never replaces a newer one
+    latest: Dict[str, Any] = {"created_at": created_at, "url": url}
+    if score is not None:
+        latest["score"] = score
+    return latest
+
+
+def user_stats_update(
+    report_id: ObjectId, url: str, score, created_at: datetime
+) -> dict:
+    """The update document that folds one report into a user's rollup."""
+    update: Dict[str, Any] = {
+        "$inc": {"count": 1, "version": 1},
+        "$max": {
+            "last_report_at": created_at,
+            f"latest_by_url.{_url_key(url)}": _latest_entry(url, score, created_at),
+        },
+        "$push": {"applied_ids": {"$each": [report_id], "$slice": -STATS_APPLIED_KEEP}},
+    }
+    if score is not None:
+        update["$inc"]["score_sum"] = score
+        update["$inc"]["scored_count"] = 1
+        update["$inc"][f"histogram.{_score_bucket(score)}"] = 1
+        update["$min"] = {"score_min": score}
+        update["$max"]["score_max"] = score
+    return update
+
+
+async def get_user_stats(user_id: str) -> Optional[dict]:
+    """
+    O(1) read of a user's rollup, shaped for the dashboard. Returns None
+    while there is no complete rollup (see rebuild_user_stats).
+    """
+    doc = await user_stats_collection.find_one(
+        {"_id": ObjectId(user_id)}, {"applied_ids": 0, "latest_by_url": 0}
+    )
+    if not _stats_complete(doc):
+        return None
+    scored = doc.get("scored_count", 0)
+    histogram = doc.get("histogram", {})
+    return {
+        "total_audits": doc.get("count", 0),
+        "average_score": doc.get("score_sum", 0) / scored if scored else 0,
+        "min_score": doc.get("score_min"),
+        "max_score": doc.get("score_max"),
+        "score_histogram": [histogram.get(f"b{i}", 0) for i in range(SCORE_BUCKETS)],
+        "last_report_at": doc.get("last_report_at"),
+    }
+
+
+async def get_user_latest_scores(user_id: str) -> Optional[List[dict]]:
+    """
+    Latest score per audited URL from the rollup, newest first. None while
+    there is no complete rollup (see get_user_report_latest_scores).
+    """
+    doc = await user_stats_collection.find_one(
+        {"_id": ObjectId(user_id)}, {"latest_by_url": 1, "complete": 1, "schema": 1}
+    )
+    if not _stats_complete(doc):
+        return None
+    latest = list(doc.get("latest_by_url", {}).values())
+    return sorted(latest, key=lambda entry: entry["created_at"], reverse=True)
+
+
+async def _compute_user_stats(user_id: ObjectId) -> Optional[dict]:
+    """A user's rollup recomputed from seo_reports (None if they have none)."""
+    pipeline = [
+        {"$match": {"user_id": user_id}},
+        {"$sort": {"created_at": 1}},
+        {"$project": {"url": 1, "created_at": 1, "score": SCORE_EXPR}},
+    ]
+    doc: Dict[str, Any] = {
+        "_id": user_id,
+        "count": 0,
+        "histogram": {},
+        "latest_by_url": {},
+        "applied_ids": [],
+    }
+    async for report in reports_collection.aggregate(pipeline):
+        score = report.get("score")
+        doc["count"] += 1
+        doc["last_report_at"] = report["created_at"]
+        if score is not None:
+            doc["score_sum"] = doc.get("score_sum", 0) + score
+            doc["scored_count"] = doc.get("scored_count", 0) + 1
+            doc["score_min"] = min(doc.get("score_min", score), score)
+            doc["score_max"] = max(doc.get("score_max", score), score)
+            bucket = _score_bucket(score)
+            doc["histogram"][bucket] = doc["histogram"].get(bucket, 0) + 1
+        doc["latest_by_url"][_url_key(report["url"])] = _latest_entry(
+            report["url"], score, report["created_at"]
+        )
+        doc["applied_ids"].append(report["_id"])
+    if not doc["count"]:
+        return None
+    doc["applied_ids"] = doc["applied_ids"][-STATS_APPLIED_KEEP:]
+    return doc
+
+
+async def _rebuild_one(user_id: ObjectId, attempts: int = 5) -> bool:
+    """
+    Optimistic rebuild of one rollup: the stored `version` is read before
+    aggregating and the replace only matches that same version, so a report
+    folded in meanwhile (which bumps it) makes us recompute instead of
+    overwriting its $inc. Returns whether the rollup was written.
+    """
+    for _ in range(attempts):
+        current = await user_stats_collection.find_one({"_id": user_id}, {"version": 1})
+        doc = await _compute_user_stats(user_id)
+        if current is None:
+            if doc is None:
+                return False
+            try:
+                await user_stats_collection.insert_one(
+                    {**doc, "version": 0, "complete": True, "schema": STATS_SCHEMA}
+                )
+                return True
+            except pymongo.errors.DuplicateKeyError:
+                continue  # the write-behind buffer created it first
+        guard = {"_id": user_id, "version": current.get("version", 0)}
+        if doc is None:
+            res = await user_stats_collection.delete_one(guard)
+            if res.deleted_count:
+                return False
+        else:
+            doc.update(
+                version=current.get("version", 0) + 1, complete=True, schema=STATS_SCHEMA
+            )
+            res = await user_stats_collection.replace_one(guard, doc)
+            if res.matched_count:
+                return True
+    raise RuntimeError(f"user_stats for {user_id} kept changing during rebuild")
+
+
+async def rebuild_user_stats(user_id: Optional[str] = None) -> int:
+    """
+    Backfill/repair: recomputes rollups from seo_reports for one user (or
+    all users) and marks them complete. Safe to run while reports are being
+    saved. Returns users rebuilt.
+    """
+    if user_id:
+        return int(await _rebuild_one(ObjectId(user_id)))
+    rebuilt = 0
+    async for row in reports_collection.aggregate([{"$group": {"_id": "$user_id"}}]):
+        rebuilt += await _rebuild_one(row["_id"])
+    return rebuilt
+
+
+# --- Analysis Cache Functions ---
+
+
+async def get_cached_analysis(key: str) -> Optional[dict]:
+    """Returns a cached analysis entry if it exists and hasn't expired."""
+    return await analysis_cache_collection.find_one(
+        {"_id": key, "expires_at": {"$gt": datetime.utcnow()}}
+    )
+
+
+async def save_cached_analysis(key: str, url: str, result: dict, expires_at: datetime):
+    """Stores (or replaces) a cached analysis result."""
+    await analysis_cache_collection.replace_one(
+        {"_id": key},
+        {
+            "_id": key,
+            "url": url,
+            "result": result,
+            "created_at": datetime.utcnow(),
+            "expires_at": expires_at,
+        },
+        upsert=True,
+    )
+
+
+# --- Refresh Token Functions ---
+# Refresh tokens are opaque random strings; only their SHA-256 is stored.
+
+
+async def save_refresh_token(
+    token_hash: str, user_id: str, family: str, expires_at: datetime
+):
+    await refresh_tokens_collection.insert_one(
+        {
+            "_id": token_hash,
+            "user_id": ObjectId(user_id),
+            "family": family,
+            "used": False,
+            "created_at": datetime.utcnow(),
+            "expires_at": expires_at,
+        }
+    )
+
+
+async def use_refresh_token(token_hash: str) -> Tuple[str, Optional[dict]]:
+    """
+    Atomically consumes a refresh token. Returns ("ok", doc) the first time,
+    ("reused", doc) if it was already rotated (possible theft) and
+    ("invalid", None) if it is unknown or expired.
+    """
+    now = datetime.utcnow()
+    doc = await refresh_tokens_collection.find_one_and_update(
+        {"_id": token_hash, "used": False, "expires_at": {"$gt": now}},
+        {"$set": {"used": True, "used_at": now}},
+    )
+    if doc:
+        return "ok", doc
+    doc = await refresh_tokens_collection.find_one({"_id": token_hash})
+    if doc and doc.get("used"):
+        return "reused", doc
+    return "invalid", None
+
+
+async def revoke_refresh_family(family: str):
+    await refresh_tokens_collection.delete_many({"family": family})
+
+
+# --- Revoked Access Tokens ---
+
+
+async def add_revoked_token(jti: str, expires_at: datetime):
+    await revoked_tokens_collection.update_one(
+        {"_id": jti}, {"$set": {"expires_at": expires_at}}, upsert=True
+    )
+
+
+async def get_revoked_token_ids() -> set:
+    cursor = revoked_tokens_collection.find(
+        {"expires_at": {"$gt": datetime.utcnow()}}, {"_id": 1}
+    )
+    return {doc["_id"] async for doc in cursor}
+
+
+# --- Analytics Snapshots ---
+
+
+async def save_analytics_snapshot(node_id: str, snapshot: dict):
+    await analytics_snapshots_collection.replace_one(
+        {"_id": node_id},
+        {**snapshot, "saved_at": datetime.utcnow()},
+        upsert=True,
+    )
+
+
+async def load_analytics_snapshot(node_id: str) -> Optional[dict]:
+    return await analytics_snapshots_collection.find_one({"_id": node_id})
+
+
+async def load_peer_analytics_snapshots(node_id: str) -> AsyncIterator[dict]:
+    """Snapshots of every node except `node_id`."""
+    async for doc in analytics_snapshots_collection.find({"_id": {"$ne": node_id}}):
+        yield doc
+
+
+async def claim_stale_analytics_snapshots(
+    node_id: str, stale_before: datetime
+) -> AsyncIterator[dict]:
+    """Removes and yields, one at a time, snapshots not saved since stale_before."""
+    while True:
+        doc = await analytics_snapshots_collection.find_one_and_delete(
+            {"_id": {"$ne": node_id}, "saved_at": {"$lt": stale_before}}
+        )
+        if doc is None:
+            return
+        yield doc
+
+
+# --- Analysis Jobs ---
+# status: queued -> running -> done | failed. A running job whose lease has
+# expired was abandoned by a dead worker and can be claimed again.
+
+
+async def create_job(job_id: str, user_id: Optional[str], url: str, options: dict):
+    await analysis_jobs_collection.insert_one(
+        {
+            "_id": job_id,
+            "user_id": user_id,
+            "url": url,
+            "options": options,
+            "status": "queued",
+            "progress": {},
+            "attempts": 0,
+            "created_at": datetime.utcnow(),
+        }
+    )
+
+
+async def claim_job(worker_id: str, lease_seconds: int, max_attempts: int) -> Optional[dict]:
+    """Atomically takes the oldest runnable job and leases it to worker_id."""
+    now = datetime.utcnow()
+    return await analysis_jobs_collection.find_one_and_update(
+        {
+            "$or": [
+                {"status": "queued"},
+                {"status": "running", "lease_until": {"$lt": now}},
+            ],
+            "attempts": {"$lt": max_attempts},
+        },
+        {
+            "$set": {
+                "status": "running",
+                "worker": worker_id,
+                "started_at": now,
+                "lease_until": now + timedelta(seconds=lease_seconds),
+                "progress": {},
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", ASCENDING)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+async def fail_abandoned_jobs(max_attempts: int, expires_at: datetime) -> int:
+    """Marks jobs that died on their last allowed attempt as failed."""
+    result = await analysis_jobs_collection.update_many(
+        {
+            "status": "running",
+            "lease_until": {"$lt": datetime.utcnow()},
+            "attempts": {"$gte": max_attempts},
+        },
+        {
+            "$set": {
+                "status": "failed",
+                "error": "Analysis was interrupted too many times",
+                "finished_at": datetime.utcnow(),
+                "expires_at": expires_at,
+            }
+        },
+    )
+    return result.modified_count
+
+
+async def update_job_progress(
+    job_id: str, worker_id: str, progress: dict, lease_seconds: int
+):
+    """Records stage progress and renews the worker's lease on the job."""
+    await analysis_jobs_collection.update_one(
+        {"_id": job_id, "worker": worker_id, "status": "running"},
+        {
+            "$set": {
+                "progress": progress,
+                "lease_until": datetime.utcnow() + timedelta(seconds=lease_seconds),
+            }
+        },
+    )
+
+
+async def release_jobs(worker_id: str) -> int:
+    """Puts a stopping worker's running jobs back in the queue."""
+    result = await analysis_jobs_collection.update_many(
+        {"worker": worker_id, "status": "running"},
+        {
+            "$set": {"status": "queued", "progress": {}},
+            "$unset": {"lease_until": "", "worker": ""},
+            "$inc": {"attempts": -1},
+        },
+    )
+    return result.modified_count
+
+
+async def finish_job(
+    job_id: str,
+    worker_id: str,
+    status: str,
+    expires_at: datetime,
+    result: Optional[dict] = None,
+    error: Optional[str] = None,
+) -> bool:
+    """Records the outcome; False if the job is no longer this worker's."""
+    res = await analysis_jobs_collection.update_one(
+        {"_id": job_id, "worker": worker_id, "status": "running"},
+        {
+            "$set": {
+                "status": status,
+                "result": result,
+                "error": error,
+                "finished_at": datetime.utcnow(),
+                "expires_at": expires_at,
+            },
+            "$unset": {"lease_until": ""},
+        },
+    )
+    return res.modified_count == 1
+
+
+async def get_job(job_id: str) -> Optional[dict]:
+    return await analysis_jobs_collection.find_one({"_id": job_id})
+
+
+# --- Onboarding ---
+
+
+async def get_onboarding_website(user_id: str) -> Optional[str]:
+    """The website from the user's most recent onboarding submission."""
+    doc = await onboarding_collection.find_one(
+        {"user_id": ObjectId(user_id)},
+        {"data.website": 1},
+        sort=[("created_at", DESCENDING)],
+    )
+    return ((doc or {}).get("data") or {}).get("website") or None
+
+
+# --- Site Crawls ---
+# One site_crawls document per crawl (status, limits, progress, final report)
+# and one crawl_pages document per page, stored like seo_reports: a small
+# summary plus the compressed full result.
+
+
+async def create_crawl(user_id: str, seed: str, max_pages: int, max_depth: int) -> str:
+    now = datetime.utcnow()
+    result = await site_crawls_collection.insert_one(
+        {
+            "user_id": ObjectId(user_id),
+            "seed": seed,
+            "status": "queued",
+            "max_pages": max_pages,
+            "max_depth": max_depth,
+            "pages_crawled": 0,
+            "created_at": now,
+            "updated_at": now,
+        }
+    )
+    return str(result.inserted_id)
+
+
+async def update_crawl(crawl_id: str, fields: dict, inc: Optional[dict] = None):
+    update: Dict[str, Any] = {"$set": {**fields, "updated_at": datetime.utcnow()}}
+    if inc:
+        update["$inc"] = inc
+    await site_crawls_collection.update_one({"_id": ObjectId(crawl_id)}, update)
+
+
+async def get_crawl(user_id: str, crawl_id: str) -> Optional[dict]:
+    try:
+        return await site_crawls_collection.find_one(
+            {"_id": ObjectId(crawl_id), "user_id": ObjectId(user_id)}
+        )
+    except Exception:
+        return None
+
+
+async def build_crawl_page_document(
+    crawl_id: str, url: str, depth: int, found_on: Optional[str], data: dict
+) -> dict:
+    page_id = ObjectId()
+    page = {
+        "_id": page_id,
+        "crawl_id": ObjectId(crawl_id),
+        "url": url,
+        "final_url": data.get("final_url"),
+        "depth": depth,
+        "found_on": found_on,
+        "status_code": data.get("status_code"),
+        "duplicate_of": data.get("duplicate_of"),
+        "error": data.get("error"),
+        "summary": summarize_report(data),
         "created_at": datetime.utcnow(),
     }
-    return reports_collection.insert_one(report)
+    if not data.get("error"):
+        page["detail"] = await _store_report_detail(data, page_id)
+    return page
+
 
+async def save_crawl_pages(pages: List[dict]):
+    if pages:
+        await crawl_pages_collection.insert_many(pages, ordered=False)
 
-def get_user_reports(user_id: str) -> List[dict]:
-    """Gets all reports for a specific user."""
-    reports = reports_collection.find({"user_id": ObjectId(user_id)}).sort(
-        "created_at", -1
+
+async def find_crawl_pages(
+    crawl_id: str, limit: int = 50, after: Optional[Tuple[datetime, ObjectId]] = None
+) -> List[dict]:
+    """One page of a crawl's results, newest first, without the detail blob."""
+    query = {"crawl_id": ObjectId(crawl_id), **keyset_filter(after)}
+    cursor = (
+        crawl_pages_collection.find(query, {"detail": 0})
+        .sort([("created_at", DESCENDING), ("_id", DESCENDING)])
+        .limit(limit)
     )
+    return [
+        {**page, "_id": str(page["_id"]), "crawl_id": crawl_id} async for page in cursor
+    ]
+
+
+async def get_crawl_page(crawl_id: str, page_id: str) -> Optional[dict]:
+    try:
+        page = await crawl_pages_collection.find_one(
+            {"_id": ObjectId(page_id), "crawl_id": ObjectId(crawl_id)}
+        )
+    except Exception:
+        return None
+    if not page:
+        return None
+    detail = page.pop("detail", None)
+    if detail is not None:
+        page["data"] = await _load_report_detail(detail)
+    page["_id"] = str(page["_id"])
+    page["crawl_id"] = crawl_id
+    return page
+
 
-    # Convert ObjectId to string for JSON serialization
+def _duplicates_facet(field: str, name: str) -> List[dict]:
     return [
-        {**report, "_id": str(report["_id"]), "user_id": str(report["user_id"])}
-        for report in reports
+        {"$match": {field: {"$nin": [None, ""]}, "error": None, "duplicate_of": None}},
+        {"$group": {"_id": f"${field}", "count": {"$sum": 1}, "urls": {"$push": "$url"}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+        {"$limit": 20},
+        {"$project": {"_id": 0, name: "$_id", "count": 1, "urls": {"$slice": ["$urls", 10]}}},
+    ]
+
+
+async def build_crawl_report(crawl_id: str) -> dict:
+    """Site-level report computed from the stored pages in one aggregation."""
+    missing_title = {"$in": [{"$ifNull": ["$summary.title", ""]}, ["", "No Title"]]}
+    missing_description = {
+        "$in": [{"$ifNull": ["$summary.metaTags.description", ""]}, [""]]
+    }
+    missing_h1 = {"$lte": [{"$ifNull": ["$summary.counts.headings.h1", 0]}, 0]}
+
+    def count_if(condition) -> dict:
+        return {"$sum": {"$cond": [condition, 1, 0]}}
+
+    ok = {"$eq": ["$error", None]}
+    pipeline = [
+        {"$match": {"crawl_id": ObjectId(crawl_id)}},
+        {
+            "$facet": {
+                "totals": [
+                    {
+                        "$group": {
+                            "_id": None,
+                            "pages": {"$sum": 1},
+                            "errors": count_if({"$ne": ["$error", None]}),
+                            "duplicates": count_if({"$ne": ["$duplicate_of", None]}),
+                            # $avg skips the nulls, i.e. failed pages
+                            "avg_score": {
+                                "$avg": {"$cond": [ok, "$summary.score", None]}
+                            },
+                            "max_depth": {"$max": "$depth"},
+                            "missing_title": count_if({"$and": [ok, missing_title]}),
+                            "missing_description": count_if(
+                                {"$and": [ok, missing_description]}
+                            ),
+                            "missing_h1": count_if({"$and": [ok, missing_h1]}),
+                            "images_without_alt": {
+                                "$sum": "$summary.counts.images_without_alt"
+                            },
+                        }
+                    },
+                    {"$project": {"_id": 0}},
+                ],
+                "status_codes": [
+                    {"$group": {"_id": "$status_code", "count": {"$sum": 1}}},
+                    {"$sort": {"_id": 1}},
+                ],
+                "broken_pages": [
+                    {"$match": {"status_code": {"$gte": 400}}},
+                    {"$project": {"_id": 0, "url": 1, "status_code": 1, "found_on": 1}},
+                    {"$limit": 100},
+                ],
+                "failed_pages": [
+                    {"$match": {"error": {"$ne": None}}},
+                    {"$project": {"_id": 0, "url": 1, "error": 1, "found_on": 1}},
+                    {"$limit": 100},
+                ],
+                "duplicate_titles": _duplicates_facet("summary.title", "title"),
+                "duplicate_descriptions": _duplicates_facet(
+                    "summary.metaTags.description", "description"
+                ),
+            }
+        },
     ]
+    facets = await crawl_pages_collection.aggregate(pipeline).to_list(length=1)
+    facets = facets[0] if facets else {}
+    totals = (facets.get("totals") or [{}])[0]
+    if totals.get("avg_score") is not None:
+        totals["avg_score"] = round(totals["avg_score"], 1)
+    return {
+        **totals,
+        "status_codes": {
+            str(row["_id"]): row["count"] for row in facets.get("status_codes", [])
+        },
+        "broken_pages": facets.get("broken_pages", []),
+        "failed_pages": facets.get("failed_pages", []),
+        "duplicate_titles": facets.get("duplicate_titles", []),
+        "duplicate_descriptions": facets.get("duplicate_descriptions", []),
+    }
@@ -6,8 +6,18 @@ from fastapi.middleware.cors import CORSMiddleware
 load_dotenv()
 
 # Import local modules AFTER .env is loaded
-from database import create_db_and_tables
-from routes import analytics, seo, users
+from database import close_db, create_db_and_tables
+from routes import analytics, crawls, jobs, reports, seo, users
+from services.analytics_store import analytics_store
+from services.broadcast import hub
+from services.browser_pool import browser_pool
+from services.crawler import crawl_manager
+from services.http_client import close_http_client, start_http_client
+from services.job_queue import job_queue
+from services.parse_pool import start_parse_pool, stop_parse_pool
+from services.report_writer import report_writer
+from utils.auth import get_hash_metrics
+from utils.revocation import revocation_list
 
 # --- 1. Create FastAPI app ---
 app = FastAPI(
@@ -37,6 +47,9 @@ app.add_middleware(
 # -----------------------------------
 app.include_router(users.router, prefix="/users", tags=["Users"])
 app.include_router(seo.router, tags=["SEO"])
+app.include_router(reports.router, tags=["Reports"])
+app.include_router(jobs.router, tags=["Jobs"])
+app.include_router(crawls.router, tags=["Crawls"])
 app.include_router(analytics.router, prefix="/api", tags=["Analytics"])
 
 
@@ -47,13 +60,42 @@ app.include_router(analytics.router, prefix="/api", tags=["Analytics"])
 async def startup_event():
     # This must run to set up the database collections
     print("Running database initialization...")
-    create_db_and_tables()
+    await create_db_and_tables()
+    # One pooled keep-alive client for every outbound call
+    await start_http_client()
+    # Warm parser processes for CPU-bound HTML extraction
+    start_parse_pool()
+    # Background batching of report writes
+    report_writer.start()
+    # Workers for queued analysis jobs (picks up jobs left by a restart)
+    job_queue.start()
+    # Keep the in-memory access-token revocation set in sync
+    revocation_list.start()
+    # Restore analytics rollups and snapshot them periodically
+    await analytics_store.start()
+    # Launch the shared Chromium pool once instead of per analysis request
+    try:
+        await browser_pool.start()
+    except Exception as e:
+        print(f"⚠️ Browser pool failed to start, will retry on demand: {e}")
     print("🚀 SEOtron API started successfully!")
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     print("🛑 SEOtron API shutting down...")
+    # Re-queue unfinished jobs, stop crawls, then flush buffered reports,
+    # before the database client goes away
+    await job_queue.stop()
+    await crawl_manager.stop()
+    await report_writer.stop()
+    await revocation_list.stop()
+    await hub.stop()
+    await analytics_store.stop()
+    await browser_pool.stop()
+    await close_http_client()
+    stop_parse_pool()
+    close_db()
 
 
 # -----------------------------------
@@ -67,3 +109,9 @@ async def root():
 @app.get("/api/hello")
 async def hello():
     return {"message": "Hello from FastAPI 👋"}
+
+
+@app.get("/api/metrics/hashing")
+async def hashing_metrics():
+    # Password hashing pool: in-flight jobs and per-operation timings
+    return get_hash_metrics()
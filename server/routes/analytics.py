@@ -30,60 +30,102 @@
 
 
 # server/routes/analytics.py
-from fastapi import APIRouter
-import asyncio, random
-from sse_starlette.sse import EventSourceResponse
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from services.analytics_service import DEFAULT_POINTS, get_analytics_payload
+from services.analytics_store import analytics_store
+from services.broadcast import hub
+from services.timeseries import parse_range
 
 router = APIRouter()
 
-# Analytics JSON endpoint
-@router.get("/analytics")
-async def analytics():
-    return {
-        "overview": {
-            "sessions": 1000 + random.randint(-100, 100),
-            "users": 200 + random.randint(-20, 20),
-            "bounceRate": random.randint(30, 70),
-            "conversions": random.randint(50, 200)
-        },
-        "sessionsTimeseries": [{"time": f"2025-10-{i+1}", "value": random.randint(100, 500)} for i in range(7)],
-        "conversionTimeseries": [{"time": f"2025-10-{i+1}", "value": random.randint(10, 100)} for i in range(7)],
-        "trafficSources": [
-            {"name": "Direct", "value": random.randint(100, 500)},
-            {"name": "Referral", "value": random.randint(50, 300)},
-            {"name": "Organic", "value": random.randint(150, 600)},
-            {"name": "Social", "value": random.randint(20, 150)},
+ANALYTICS_MAX_BATCH = 1000
+
+
+class AnalyticsEvent(BaseModel):
+    type: str  # session | pageview | conversion | bounce
+    ts: Optional[datetime] = None  # defaults to receive time
+    source: Optional[str] = None  # Organic, Direct, Referral, ...
+    new_user: bool = False
+    value: Optional[float] = None
+
+
+class AnalyticsEventBatch(BaseModel):
+    events: List[AnalyticsEvent] = Field(..., max_length=ANALYTICS_MAX_BATCH)
+
+
+class IngestResponse(BaseModel):
+    accepted: int
+    dropped: int
+
+
+# Batched event ingestion (tracking snippet / server-side collectors)
+@router.post("/analytics/events", response_model=IngestResponse)
+async def ingest_events(batch: AnalyticsEventBatch):
+    accepted, dropped = analytics_store.ingest(
+        [
+            {
+                "type": e.type,
+                # Naive timestamps are taken as UTC
+                "ts": e.ts.replace(tzinfo=e.ts.tzinfo or timezone.utc).timestamp()
+                if e.ts
+                else None,
+                "source": e.source,
+                "new_user": e.new_user,
+                "value": e.value,
+            }
+            for e in batch.events
         ]
-    }
+    )
+    return {"accepted": accepted, "dropped": dropped}
+
+
+# Analytics JSON endpoint, answered from pre-aggregated rollups
+@router.get("/analytics")
+async def analytics(
+    range_: str = Query("7d", alias="range", description="e.g. 90m, 24h, 7d, 12w, 1y"),
+    resolution: str = Query("day", pattern="^(auto|minute|hour|day)$"),
+    points: int = Query(DEFAULT_POINTS, ge=3, le=5000),
+    end: Optional[datetime] = None,
+):
+    try:
+        range_seconds = parse_range(range_)
+        end_ts = (
+            int(end.replace(tzinfo=end.tzinfo or timezone.utc).timestamp())
+            if end
+            else None
+        )
+        return get_analytics_payload(range_seconds, resolution, points, end_ts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Live update payload: built once per tick by the hub, shared by all clients
+async def build_live_update():
+    return get_analytics_payload()
+
+
+# Clients get a full snapshot, then only changed fields and new points
+hub.register("analytics", build_live_update, interval=5, delta=True)
 
 # SSE live events endpoint
 @router.get("/events")
-async def events():
-    async def event_generator():
-        while True:
-            await asyncio.sleep(5)
-            snippet = {
-                "overview": {
-                    "sessions": 1000 + random.randint(-100, 100),
-                    "users": 200 + random.randint(-20, 20),
-                    "bounceRate": random.randint(30, 70),
-                    "conversions": random.randint(50, 200)
-                },
-                "sessionsTimeseries": [{"time": f"2025-10-{i+1}", "value": random.randint(100, 500)} for i in range(7)],
-                "conversionTimeseries": [{"time": f"2025-10-{i+1}", "value": random.randint(10, 100)} for i in range(7)],
-                "trafficSources": [
-                    {"name": "Direct", "value": random.randint(100, 500)},
-                    {"name": "Referral", "value": random.randint(50, 300)},
-                    {"name": "Organic", "value": random.randint(150, 600)},
-                    {"name": "Social", "value": random.randint(20, 150)},
-                ]
-            }
-            yield {"event": "update", "data": snippet}
-
+async def events(last_event_id: Optional[str] = Header(None)):
     headers = {
         "Cache-Control": "no-cache",
-        "Content-Type": "text/event-stream",
         "Access-Control-Allow-Origin": "*",  # allow frontend
+        "X-Accel-Buffering": "no",  # don't let proxies buffer the stream
     }
 
-    return EventSourceResponse(event_generator(), headers=headers)
+    # Each client only drains pre-serialized frames from its own queue;
+    # Last-Event-ID (sent automatically by EventSource on reconnect) resumes
+    return StreamingResponse(
+        hub.subscribe("analytics", last_event_id),
+        media_type="text/event-stream",
+        headers=headers,
+    )
@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from database import find_crawl_pages, get_crawl, get_crawl_page, get_onboarding_website
+from fastapi import APIRouter, Depends, HTTPException, Query
+from models.user import User
+from pydantic import BaseModel, Field
+from services.crawler import (
+    CRAWL_MAX_DEPTH,
+    CRAWL_MAX_PAGES,
+    CRAWL_STALE_SECONDS,
+    crawl_manager,
+)
+from utils.auth import get_current_user
+from utils.pagination import decode_cursor, encode_cursor
+
+router = APIRouter(prefix="/api/crawls", tags=["Crawls"])
+
+
+class CrawlRequest(BaseModel):
+    url: Optional[str] = None  # defaults to the onboarding website
+    max_pages: int = Field(50, ge=1, le=CRAWL_MAX_PAGES)
+    max_depth: int = Field(3, ge=0, le=CRAWL_MAX_DEPTH)
+
+
+class CrawlStarted(BaseModel):
+    crawl_id: str
+    seed: str
+    status: str
+
+
+def _crawl_view(crawl: dict) -> dict:
+    status = crawl["status"]
+    stale_before = datetime.utcnow() - timedelta(seconds=CRAWL_STALE_SECONDS)
+    if status in ("queued", "running") and crawl.get(
+        "updated_at", datetime.min
+    ) < stale_before:
+        status = "interrupted"  # its process went away before finishing
+    return {
+        "crawl_id": str(crawl["_id"]),
+        "seed": crawl["seed"],
+        "status": status,
+        "max_pages": crawl["max_pages"],
+        "max_depth": crawl["max_depth"],
+        "pages_crawled": crawl.get("pages_crawled", 0),
+        "created_at": crawl.get("created_at"),
+        "started_at": crawl.get("started_at"),
+        "finished_at": crawl.get("finished_at"),
+        "report": crawl.get("report"),
+        "error": crawl.get("error"),
+    }
+
+
+async def _get_user_crawl(crawl_id: str, current_user: Optional[User]) -> dict:
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    crawl = await get_crawl(current_user["_id"], crawl_id)
+    if not crawl:
+        raise HTTPException(status_code=404, detail="Crawl not found")
+    return crawl
+
+
+# --- Start a site crawl (Path: /api/crawls) ---
+@router.post("", response_model=CrawlStarted, status_code=202)
+async def start_crawl(
+    request: CrawlRequest, current_user: User = Depends(get_current_user)
+):
+    """
+    Crawls the site breadth-first from `url` (or the onboarding website) in
+    the background. Poll GET /api/crawls/{crawl_id} for progress and the
+    site report once `status` is "done".
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    seed = request.url or await get_onboarding_website(str(current_user["_id"]))
+    if not seed:
+        raise HTTPException(
+            status_code=400, detail="No URL given and no onboarding website on file"
+        )
+
+    crawl_id = await crawl_manager.start(
+        str(current_user["_id"]), seed, request.max_pages, request.max_depth
+    )
+    return {"crawl_id": crawl_id, "seed": seed, "status": "queued"}
+
+
+@router.get("/{crawl_id}")
+async def read_crawl(crawl_id: str, current_user: User = Depends(get_current_user)):
+    return _crawl_view(await _get_user_crawl(crawl_id, current_user))
+
+
+@router.get("/{crawl_id}/pages")
+async def list_crawl_pages(
+    crawl_id: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    """Per-page results of a crawl (summaries only), newest first."""
+    await _get_user_crawl(crawl_id, current_user)
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Ask for one extra row to know whether another page exists
+    pages = await find_crawl_pages(crawl_id, limit=limit + 1, after=after)
+    has_more = len(pages) > limit
+    pages = pages[:limit]
+
+    return {
+        "pages": pages,
+        "next_cursor": (
+            encode_cursor(pages[-1]["created_at"], pages[-1]["_id"]) if has_more else None
+        ),
+    }
+
+
+@router.get("/{crawl_id}/pages/{page_id}")
+async def read_crawl_page(
+    crawl_id: str, page_id: str, current_user: User = Depends(get_current_user)
+):
+    """One crawled page including its full analysis result."""
+    await _get_user_crawl(crawl_id, current_user)
+    page = await get_crawl_page(crawl_id, page_id)
+    if not page:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return page
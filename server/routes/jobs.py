@@ -0,0 +1,106 @@
+from typing import Optional
+
+from database import get_job
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from models.user import User
+from pydantic import BaseModel
+from services.broadcast import HEARTBEAT_FRAME, SSE_HEARTBEAT_SECONDS, format_sse
+from services.job_queue import JOB_POLL_SECONDS, TERMINAL_STATUSES, job_queue
+from utils.auth import get_current_user
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+
+class JobRequest(BaseModel):
+    url: str
+
+
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+
+
+def _job_view(job: dict) -> dict:
+    view = {
+        "job_id": job["_id"],
+        "url": job["url"],
+        "status": job["status"],
+        "progress": job.get("progress", {}),
+        "attempts": job.get("attempts", 0),
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+    }
+    if job["status"] in TERMINAL_STATUSES:
+        view["result"] = job.get("result")
+        view["error"] = job.get("error")
+    return view
+
+
+async def _get_visible_job(job_id: str, current_user: Optional[User]) -> dict:
+    job = await get_job(job_id)
+    # Jobs submitted while signed in are private to that user
+    owner = job.get("user_id") if job else None
+    if job is None or (owner and (not current_user or str(current_user["_id"]) != owner)):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# --- Submit an analysis (Path: /api/jobs) ---
+@router.post("", response_model=JobSubmitted, status_code=202)
+async def submit_job(
+    request: JobRequest,
+    http_request: Request,
+    current_user: Optional[User] = Depends(get_current_user),
+):
+    """
+    Queues an analysis and returns at once. Poll GET /api/jobs/{job_id} or
+    stream GET /api/jobs/{job_id}/events for progress and the result.
+    """
+    cache_control = http_request.headers.get("cache-control", "").lower()
+    job_id = await job_queue.submit(
+        str(current_user["_id"]) if current_user else None,
+        request.url,
+        bypass_cache="no-cache" in cache_control,
+    )
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/{job_id}")
+async def read_job(
+    job_id: str, current_user: Optional[User] = Depends(get_current_user)
+):
+    return _job_view(await _get_visible_job(job_id, current_user))
+
+
+@router.get("/{job_id}/events")
+async def job_events(
+    job_id: str, current_user: Optional[User] = Depends(get_current_user)
+):
+    """
+    SSE stream: a "progress" event whenever the status or a stage changes,
+    then one "done" or "failed" event carrying the full job, then the end.
+    """
+    await _get_visible_job(job_id, current_user)
+
+    async def stream():
+        idle = 0.0
+        async for job in job_queue.watch(job_id):
+            if job is None:
+                idle += 1
+                # watch() wakes at least every JOB_POLL_SECONDS
+                if idle * JOB_POLL_SECONDS >= SSE_HEARTBEAT_SECONDS:
+                    idle = 0.0
+                    yield HEARTBEAT_FRAME
+                continue
+            idle = 0.0
+            view = _job_view(job)
+            event = job["status"] if job["status"] in TERMINAL_STATUSES else "progress"
+            yield format_sse(view, event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,88 @@
+from datetime import datetime
+from typing import Optional
+
+from database import REPORT_LIST_FIELDS, find_user_reports, get_report_detail
+from fastapi import APIRouter, Depends, HTTPException, Query
+from models.user import User
+from utils.auth import get_current_user
+from utils.pagination import decode_cursor, encode_cursor
+
+router = APIRouter(prefix="/api/reports", tags=["Reports"])
+
+DEFAULT_FIELDS = "url,title,score"
+
+
+# --- Report History (Path: /api/reports) ---
+@router.get("")
+async def list_reports(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    url: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    min_score: Optional[int] = Query(None, ge=0, le=100),
+    max_score: Optional[int] = Query(None, ge=0, le=100),
+    fields: str = DEFAULT_FIELDS,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Pages through the user's saved reports, newest first. Pass the returned
+    `next_cursor` back as `cursor` for the next page; `fields` is a
+    comma-separated list of summary fields to include.
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in REPORT_LIST_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. "
+            f"Allowed: {', '.join(REPORT_LIST_FIELDS)}",
+        )
+
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Ask for one extra row to know whether another page exists
+    reports = await find_user_reports(
+        current_user["_id"],
+        requested,
+        limit=limit + 1,
+        after=after,
+        url=url,
+        since=since,
+        until=until,
+        min_score=min_score,
+        max_score=max_score,
+    )
+    has_more = len(reports) > limit
+    reports = reports[:limit]
+
+    return {
+        "reports": reports,
+        "next_cursor": (
+            encode_cursor(reports[-1]["created_at"], reports[-1]["_id"])
+            if has_more
+            else None
+        ),
+    }
+
+
+# --- Report Detail (Path: /api/reports/{report_id}) ---
+@router.get("/{report_id}")
+async def read_report(report_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Returns one saved report including the full analysis result. The detail
+    blob is only fetched and decompressed here, never in list views.
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    report = await get_report_detail(current_user["_id"], report_id)
+    if not report:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
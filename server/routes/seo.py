@@ -1,13 +1,27 @@
+import asyncio
+import json
+from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from database import get_user_reports, save_seo_report
-from fastapi import APIRouter, Depends
+from database import (
+    get_user_latest_scores,
+    get_user_report_latest_scores,
+    get_user_report_stats,
+    get_user_report_summaries,
+    get_user_stats,
+    rebuild_user_stats,
+)
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from models.user import User  # Assuming User is imported from models.user
 from pydantic import BaseModel, Field
-
-# ✨ NEW IMPORT: Import the new AI service function
-from services.seo_service import analyze_keyword, analyze_url, ask_ai_for_report
+from services.analysis_cache import analyze_url_cached
+from services.batch_analysis import BATCH_MAX_URLS, analyze_batch
+from services.broadcast import format_sse
+from services.report_writer import report_writer
+from services.seo_service import analyze_keyword, ask_ai_for_report
 from utils.auth import get_current_user
+from utils.pagination import decode_cursor, encode_cursor
 
 router = APIRouter(prefix="/api", tags=["SEO"])
 
@@ -32,34 +46,99 @@ async def keyword_analysis(request: KeywordRequest):
 
 
 # -------------------------
-# Dashboard / User Progress (Unchanged)
+# Dashboard / User Progress
 # -------------------------
-@router.get("/dashboard/progress")
-async def get_progress(current_user: User = Depends(get_current_user)):
-    analyses = get_user_reports(current_user["_id"])
-    total_audits = len(analyses)
+_stats_rebuilds: Dict[str, asyncio.Task] = {}
+
+
+def _schedule_stats_rebuild(user_id: str):
+    """Completes a user's rollup in the background, once at a time per user."""
+    if user_id in _stats_rebuilds:
+        return
+
+    async def rebuild():
+        try:
+            await rebuild_user_stats(user_id)
+        except Exception as e:
+            print(f"⚠️ Stats rebuild for {user_id} failed: {e}")
+
+    task = asyncio.create_task(rebuild())
+    _stats_rebuilds[user_id] = task
+    task.add_done_callback(lambda _: _stats_rebuilds.pop(user_id, None))
 
-    if total_audits == 0:
+
+@router.get("/dashboard/progress")
+async def get_progress(
+    limit: int = Query(50, ge=1, le=500),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    try:
+        after = decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    # Whole-history stats come from the per-user rollup document; only
+    # date-windowed requests aggregate over the reports themselves.
+    user_id = str(current_user["_id"])
+    windowed = since is not None or until is not None
+    stats, latest_scores, analyses = await asyncio.gather(
+        get_user_report_stats(user_id, since, until)
+        if windowed
+        else get_user_stats(user_id),
+        get_user_latest_scores(user_id),
+        # One extra row tells whether another page exists
+        get_user_report_summaries(user_id, limit + 1, since, until, after),
+    )
+    has_more = len(analyses) > limit
+    analyses = analyses[:limit]
+    if stats is None or latest_scores is None:
+        # No complete rollup yet (it may lack reports saved before rollups
+        # existed): aggregate until the rebuild has marked it complete
+        if stats is None:
+            stats = await get_user_report_stats(user_id)
+        if latest_scores is None:
+            latest_scores = await get_user_report_latest_scores(user_id)
+        _schedule_stats_rebuild(user_id)
+
+    if stats["total_audits"] == 0:
         return {"message": "No data yet", "average_score": 0, "total_audits": 0}
 
-    scores = [
-        a["data"].get("score", 0)
-        for a in analyses
-        if a["data"].get("score") is not None
-    ]
-    avg_score = sum(scores) / len(scores) if scores else 0
+    next_cursor = (
+        encode_cursor(analyses[-1]["created_at"], analyses[-1]["_id"])
+        if has_more
+        else None
+    )
 
     return {
-        "average_score": avg_score,
-        "total_audits": total_audits,
+        "average_score": stats["average_score"],
+        "total_audits": stats["total_audits"],
+        "min_score": stats.get("min_score"),
+        "max_score": stats.get("max_score"),
+        "score_histogram": stats.get("score_histogram"),
+        # Whole history, also for since/until requests
+        "latest_scores": [
+            {
+                "url": entry["url"],
+                "score": entry.get("score"),
+                "created_at": entry["created_at"],
+            }
+            for entry in latest_scores
+        ],
         "analyses": [
             {
                 "url": a["url"],
-                "score": a["data"].get("score", 0),
+                "score": a["score"],
                 "created_at": a.get("created_at"),
             }
             for a in analyses
         ],
+        "next_cursor": next_cursor,
     }
 
 
@@ -104,6 +183,13 @@ class AnalyzeRequest(BaseModel):
     url: str
 
 
+class CacheInfoModel(BaseModel):
+    hit: bool = False
+    tier: Optional[str] = None  # "memory" | "shared"
+    age_seconds: Optional[float] = None
+    coalesced: bool = False  # joined an identical analysis already running
+
+
 class AnalyzeResponse(BaseModel):
     title: str
     metaTags: Optional[MetaTagsModel] = None
@@ -115,6 +201,8 @@ class AnalyzeResponse(BaseModel):
     google_scores: Optional[Dict[str, Any]] = None
     score: Optional[int] = None
     keywords: Optional[List[str]] = []
+    timings: Optional[Dict[str, float]] = None  # per-stage wall time (ms)
+    cache: Optional[CacheInfoModel] = None
     error: Optional[str] = None
 
 
@@ -124,17 +212,68 @@ class AnalyzeResponse(BaseModel):
 @router.post("/analyze", response_model=AnalyzeResponse)
 async def analyze_website(
     request: AnalyzeRequest,
+    http_request: Request,
     current_user: Optional[User] = Depends(get_current_user),
 ):
-    result = await analyze_url(request.url)
+    # "Cache-Control: no-cache" forces a fresh analysis
+    cache_control = http_request.headers.get("cache-control", "").lower()
+    result, cache_info = await analyze_url_cached(
+        request.url, bypass_cache="no-cache" in cache_control
+    )
 
-    if "error" in result:
+    if result.get("error"):
         return result
 
     if current_user:
-        save_seo_report(current_user["_id"], request.url, result)
+        # Persisted in the background by the write-behind buffer
+        await report_writer.submit(current_user["_id"], request.url, result)
 
-    return result
+    return {**result, "cache": cache_info}
+
+
+# -------------------------
+# Batch URL Analysis Endpoint
+# -------------------------
+class BatchAnalyzeRequest(BaseModel):
+    urls: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_URLS)
+
+
+@router.post("/analyze/batch")
+async def analyze_website_batch(
+    request: BatchAnalyzeRequest,
+    http_request: Request,
+    format: Optional[str] = Query(None, pattern="^(ndjson|sse)$"),
+    current_user: Optional[User] = Depends(get_current_user),
+):
+    """
+    Analyzes up to BATCH_MAX_URLS URLs and streams each result as soon as it
+    is ready: NDJSON by default, SSE with `?format=sse` or
+    `Accept: text/event-stream`. The last item/event is a summary.
+    """
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    accept = http_request.headers.get("accept", "")
+    use_sse = format == "sse" or (format is None and "text/event-stream" in accept)
+    cache_control = http_request.headers.get("cache-control", "").lower()
+    items = analyze_batch(
+        request.urls,
+        str(current_user["_id"]),
+        bypass_cache="no-cache" in cache_control,
+    )
+
+    async def stream():
+        async for item in items:
+            if use_sse:
+                yield format_sse(item, "done" if item.get("done") else "result")
+            else:
+                yield (json.dumps(item, default=str) + "\n").encode("utf-8")
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # -------------------------------------------------
@@ -8,9 +8,12 @@ from models.user import OnboardingData, User
 from pydantic import BaseModel
 from utils.auth import (
     authenticate_user,
-    create_access_token,
     get_current_user,
     get_password_hash,
+    issue_tokens,
+    oauth2_scheme,
+    revoke_tokens,
+    rotate_refresh_token,
 )
 
 # --- Models for this file (Request/Response Bodies) ---
@@ -36,14 +39,27 @@ class LoginRequest(BaseModel):
 
 class Token(BaseModel):
     access_token: str
+    refresh_token: str
     token_type: str
+    expires_in: int
     isOnboarded: bool
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+
 class OnboardingResponse(BaseModel):
     message: str
     userId: str
     isOnboarded: bool
+    # Fresh tokens: the old access token still claims isOnboarded=False
+    access_token: Optional[str] = None
+    refresh_token: Optional[str] = None
 
 
 # Your main.py handles the prefix="/users"
@@ -55,26 +71,26 @@ router = APIRouter(tags=["Users"])
     "/signup", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
 async def signup_user(user: UserCreate):
-    db_user = get_user_by_email(user.email)
+    db_user = await get_user_by_email(user.email)
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered",
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     new_user = user.dict()
     new_user["hashed_password"] = hashed_password
     del new_user["password"]
 
-    created_user = create_user(new_user)
+    created_user = await create_user(new_user)
     return created_user
 
 
 # --- Login Endpoint (Path: /users/login) ---
 @router.post("/login", response_model=Token)
 async def login_for_access_token(form_data: LoginRequest):
-    user = authenticate_user(form_data.email, form_data.password)
+    user = await authenticate_user(form_data.email, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -82,13 +98,27 @@ async def login_for_access_token(form_data: LoginRequest):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token = create_access_token(data={"sub": user["email"]})
+    # Access token carries id/plan/onboarding claims; refresh token rotates
+    return await issue_tokens(user)
+
+
+# --- Refresh Endpoint (Path: /users/refresh) ---
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(body: RefreshRequest):
+    tokens = await rotate_refresh_token(body.refresh_token)
+    if not tokens:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return tokens
+
 
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "isOnboarded": user.get("isOnboarded", False),
-    }
+# --- Logout Endpoint (Path: /users/logout) ---
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: LogoutRequest, token: Optional[str] = Depends(oauth2_scheme)):
+    await revoke_tokens(body.refresh_token, token)
 
 
 # --- Get Current User Endpoint (Path: /users/me) ---
@@ -109,16 +139,21 @@ async def save_onboarding(
     try:
         user_id = current_user["_id"]
 
-        updated_user = update_user_onboarding(user_id, data.dict())
+        updated_user = await update_user_onboarding(user_id, data.dict())
 
         if not updated_user:
             raise HTTPException(status_code=500, detail="Failed to update user status.")
 
+        tokens = await issue_tokens(updated_user)
         return {
             "message": "Onboarding data saved successfully.",
             "userId": user_id,
             "isOnboarded": updated_user.get("isOnboarded", False),
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
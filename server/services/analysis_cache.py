@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from database import get_cached_analysis, save_cached_analysis
+from dotenv import load_dotenv
+from utils.singleflight import SingleFlight
+from utils.ttl_cache import TTLCache
+
+from services.pipeline import StageCallback
+from services.seo_service import analyze_url
+
+load_dotenv()
+
+# --- Config ---
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "500"))
+# Set to "0" to keep the cache process-local only
+ANALYSIS_CACHE_SHARED = os.getenv("ANALYSIS_CACHE_SHARED", "1") == "1"
+
+DEFAULT_OPTIONS = {"strategy": "desktop"}
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form used for cache keys: scheme defaults to https, host is
+    lowercased, default ports/fragments are dropped and query params sorted.
+    """
+    url = url.strip()
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and str(parts.port) != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+
+def cache_key(url: str, options: Optional[dict] = None) -> str:
+    payload = json.dumps(
+        {"url": normalize_url(url), "options": options or DEFAULT_OPTIONS},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Two-tier cache for analyze_url results: a per-process LRU in front of a
+    MongoDB collection shared by every worker (entries expire via TTL index).
+    """
+
+    def __init__(
+        self,
+        ttl: int = ANALYSIS_CACHE_TTL,
+        max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES,
+        shared: bool = ANALYSIS_CACHE_SHARED,
+    ):
+        self.ttl = ttl
+        self.shared = shared
+        self.memory = TTLCache(max_size=max_entries, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[Tuple[dict, dict]]:
+        """Returns (result, cache_info) on a hit, None on a miss."""
+        entry = self.memory.get_entry(key)
+        if entry:
+            result, stored_at = entry
+            age = time.time() - stored_at
+            return result, {
+                "hit": True,
+                "tier": "memory",
+                "age_seconds": round(age, 1),
+                "coalesced": False,
+            }
+
+        if not self.shared:
+            return None
+        try:
+            doc = await get_cached_analysis(key)
+        except Exception as e:
+            print(f"⚠️ Shared analysis cache read failed: {e}")
+            return None
+        if not doc:
+            return None
+
+        age = (datetime.utcnow() - doc["created_at"]).total_seconds()
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        self.memory.set(key, doc["result"], ttl=max(0, remaining))
+        return doc["result"], {
+            "hit": True,
+            "tier": "shared",
+            "age_seconds": round(age, 1),
+            "coalesced": False,
+        }
+
+    async def set(self, key: str, url: str, result: dict):
+        self.memory.set(key, result)
+        if not self.shared:
+            return
+        expires_at = datetime.utcnow() + timedelta(seconds=self.ttl)
+        try:
+            await save_cached_analysis(key, url, result, expires_at)
+        except Exception as e:
+            print(f"⚠️ Shared analysis cache write failed: {e}")
+
+
+analysis_cache = AnalysisCache()
+# Concurrent identical analyses share one pipeline run
+in_flight_analyses = SingleFlight()
+
+
+async def _analyze_and_store(
+    key: str, url: str, on_stage: Optional[StageCallback] = None
+) -> dict:
+    result = await analyze_url(url, on_stage)
+    if not result.get("error"):
+        await analysis_cache.set(key, normalize_url(url), result)
+    return result
+
+
+async def analyze_url_cached(
+    url: str,
+    options: Optional[dict] = None,
+    bypass_cache: bool = False,
+    on_stage: Optional[StageCallback] = None,
+) -> Tuple[dict, dict]:
+    """
+    analyze_url behind the result cache. Returns (result, cache_info);
+    `bypass_cache` skips the lookup (Cache-Control: no-cache) but still
+    refreshes the cached entry. Failed analyses are never cached. If the
+    same analysis is already running, this call waits for that run instead
+    of starting another one (and `on_stage` only sees the run it started).
+    """
+    key = cache_key(url, options)
+    if not bypass_cache:
+        cached = await analysis_cache.get(key)
+        if cached:
+            return cached
+
+    coalesced = in_flight_analyses.in_flight(key)
+    result = await in_flight_analyses.do(
+        key, lambda: _analyze_and_store(key, url, on_stage)
+    )
+    return result, {
+        "hit": False,
+        "tier": None,
+        "age_seconds": None,
+        "coalesced": coalesced,
+    }
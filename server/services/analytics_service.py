@@ -1,39 +1,54 @@
-import random
-import datetime
-from typing import List, Dict
+import math
+from typing import Dict, Optional
 
-def make_timeseries(days: int = 30) -> List[Dict]:
-    now = datetime.datetime.utcnow()
-    data = []
-    for i in range(days):
-        t = (now - datetime.timedelta(days=days - i - 1)).strftime("%Y-%m-%d")
-        value = max(0, int(800 + i * 6 + random.gauss(0, 80)))
-        data.append({"time": t, "value": value})
-    return data
+from services.analytics_store import METRICS, RESOLUTIONS, analytics_store
+from services.timeseries import build_series
 
-def get_analytics_payload() -> Dict:
-    payload = {
-        "overview": {
-            "sessions": 250_000 + random.randint(-5000, 5000),
-            "users": 40_000 + random.randint(-2000, 2000),
-            "bounceRate": round(40 + random.random() * 10, 2),
-            "conversions": 4200 + random.randint(-100, 200),
-        },
-        "trafficSources": [
-            {"name": "Organic", "value": 52000},
-            {"name": "Direct", "value": 35000},
-            {"name": "Referral", "value": 15000},
-            {"name": "Paid", "value": 9000},
-            {"name": "Social", "value": 6000},
-        ],
-        "pagePerformance": [
-            {"page": "/", "loadTime": 830},
-            {"page": "/pricing", "loadTime": 980},
-            {"page": "/signup", "loadTime": 760},
-            {"page": "/features", "loadTime": 1200},
-            {"page": "/blog/post-1", "loadTime": 640},
-        ],
-        "sessionsTimeseries": make_timeseries(30),
-        "conversionTimeseries": make_timeseries(30),
+DEFAULT_RANGE_SECONDS = 7 * 86400
+DEFAULT_POINTS = 500
+
+def pick_resolution(range_seconds: int, resolution: str = "auto") -> str:
+    """
+    "auto" picks the finest rollup whose retention covers the range; an
+    explicit resolution must cover it itself. Raises ValueError otherwise.
+    """
+    if resolution == "auto":
+        for name in RESOLUTIONS:  # ordered finest first
+            if analytics_store.retention(name) >= range_seconds:
+                return name
+        resolution = "day"
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown resolution '{resolution}'")
+    if analytics_store.retention(resolution) < range_seconds:
+        days = analytics_store.retention(resolution) // 86400
+        raise ValueError(
+            f"'{resolution}' data is only kept for {days} days; use a coarser resolution"
+        )
+    return resolution
+
+def get_analytics_payload(
+    range_seconds: int = DEFAULT_RANGE_SECONDS,
+    resolution: str = "day",
+    points: int = DEFAULT_POINTS,
+    end_ts: Optional[int] = None,
+) -> Dict:
+    """
+    Dashboard payload read from the rollups. Timeseries are downsampled with
+    LTTB to at most `points` points, so long ranges stay small on the wire.
+    """
+    resolution = pick_resolution(range_seconds, resolution)
+    count = math.ceil(range_seconds / RESOLUTIONS[resolution][0])
+    summary = analytics_store.overview(resolution, count, end_ts)
+    metrics = summary["metrics"]
+    starts = summary["bucket_starts"]
+    return {
+        "resolution": resolution,
+        "overview": summary["overview"],
+        "sessionsTimeseries": build_series(
+            starts, metrics[:, METRICS.index("sessions")], resolution, points
+        ),
+        "conversionTimeseries": build_series(
+            starts, metrics[:, METRICS.index("conversions")], resolution, points
+        ),
+        "trafficSources": summary["trafficSources"],
     }
-    return payload
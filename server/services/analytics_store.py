@@ -0,0 +1,352 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from bson import Binary
+from database import (
+    claim_stale_analytics_snapshots,
+    load_analytics_snapshot,
+    load_peer_analytics_snapshots,
+    save_analytics_snapshot,
+)
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Config ---
+ANALYTICS_BUFFER_SIZE = int(os.getenv("ANALYTICS_BUFFER_SIZE", "1000000"))
+ANALYTICS_SNAPSHOT_SECONDS = int(os.getenv("ANALYTICS_SNAPSHOT_SECONDS", "60"))
+# Each worker keeps its own in-memory store and snapshot, and reads merge in
+# the other workers' snapshots. A fixed id lets a restarted worker resume
+# its own snapshot; by default every process is its own node.
+ANALYTICS_NODE_ID = os.getenv("ANALYTICS_NODE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+# A node whose snapshot is this old is gone; the next worker to start folds
+# its counts into its own store
+ANALYTICS_NODE_STALE_SECONDS = int(os.getenv("ANALYTICS_NODE_STALE_SECONDS", "900"))
+
+EVENT_TYPES = ("session", "pageview", "conversion", "bounce")
+METRICS = ("sessions", "users", "pageviews", "conversions", "bounces")
+SOURCES = ("Organic", "Direct", "Referral", "Paid", "Social", "Email", "Other")
+
+# name -> (bucket width in seconds, number of buckets kept)
+RESOLUTIONS: Dict[str, Tuple[int, int]] = {
+    "minute": (60, 7 * 24 * 60),  # 7 days
+    "hour": (3600, 400 * 24),  # ~13 months
+    "day": (86400, 5 * 365),  # 5 years
+}
+
+_TYPE_CODES = {name: i for i, name in enumerate(EVENT_TYPES)}
+_SOURCE_CODES = {name.lower(): i for i, name in enumerate(SOURCES)}
+# Which metric column each event type increments
+_METRIC_FOR_TYPE = np.array(
+    [METRICS.index(m) for m in ("sessions", "pageviews", "conversions", "bounces")],
+    dtype=np.int64,
+)
+_USERS = METRICS.index("users")
+_SESSION = _TYPE_CODES["session"]
+
+
+class EventBuffer:
+    """Fixed-capacity columnar ring buffer of the most recent raw events."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.ts = np.zeros(capacity, dtype=np.int64)
+        self.type = np.zeros(capacity, dtype=np.int8)
+        self.source = np.zeros(capacity, dtype=np.int8)
+        self.new_user = np.zeros(capacity, dtype=np.bool_)
+        self.value = np.zeros(capacity, dtype=np.float32)
+        self.head = 0  # next write position
+        self.size = 0
+
+    def append(self, ts, types, sources, new_user, values):
+        n = len(ts)
+        if n >= self.capacity:  # only the newest `capacity` events fit
+            ts, types, sources, new_user, values = (
+                a[-self.capacity :] for a in (ts, types, sources, new_user, values)
+            )
+            n = self.capacity
+        idx = (self.head + np.arange(n)) % self.capacity
+        self.ts[idx] = ts
+        self.type[idx] = types
+        self.source[idx] = sources
+        self.new_user[idx] = new_user
+        self.value[idx] = values
+        self.head = int((self.head + n) % self.capacity)
+        self.size = min(self.capacity, self.size + n)
+
+
+class Rollup:
+    """
+    Pre-aggregated counters at one resolution, stored as a ring of buckets.
+    Slot i holds bucket id `bucket[i]` (= ts // step); a slot is zeroed when
+    a newer bucket claims it, so the ring always covers the latest window.
+    """
+
+    def __init__(self, step: int, slots: int):
+        self.step = step
+        self.slots = slots
+        self.bucket = np.full(slots, -1, dtype=np.int64)
+        self.metrics = np.zeros((slots, len(METRICS)), dtype=np.int64)
+        self.sources = np.zeros((slots, len(SOURCES)), dtype=np.int64)
+
+    def add(self, ts, types, sources, new_user) -> int:
+        """Folds a batch into the counters; returns events too old to keep."""
+        bucket_ids = ts // self.step
+        slots = bucket_ids % self.slots
+
+        # Anything older than the window is dropped, even if its slot is free
+        horizon = max(int(self.bucket.max()), int(bucket_ids.max())) - self.slots
+        fresh = bucket_ids > horizon
+
+        newest = np.full(self.slots, -1, dtype=np.int64)
+        np.maximum.at(newest, slots[fresh], bucket_ids[fresh])
+        claim = newest > self.bucket
+        self.bucket[claim] = newest[claim]
+        self.metrics[claim] = 0
+        self.sources[claim] = 0
+
+        keep = fresh & (bucket_ids == self.bucket[slots])
+        slots, types, sources, new_user = (
+            slots[keep], types[keep], sources[keep], new_user[keep]
+        )
+        np.add.at(self.metrics, (slots, _METRIC_FOR_TYPE[types]), 1)
+        sessions = types == _SESSION
+        np.add.at(self.metrics[:, _USERS], slots[sessions & new_user], 1)
+        np.add.at(self.sources, (slots[sessions], sources[sessions]), 1)
+        return int((~keep).sum())
+
+    def window(self, start_bucket: int, count: int):
+        """(bucket_ids, metrics, sources) for `count` consecutive buckets."""
+        bucket_ids = start_bucket + np.arange(count, dtype=np.int64)
+        slots = bucket_ids % self.slots
+        valid = (self.bucket[slots] == bucket_ids)[:, None]
+        return (
+            bucket_ids,
+            np.where(valid, self.metrics[slots], 0),
+            np.where(valid, self.sources[slots], 0),
+        )
+
+    def to_doc(self) -> dict:
+        return {
+            "step": self.step,
+            "slots": self.slots,
+            "bucket": Binary(self.bucket.tobytes()),
+            "metrics": Binary(self.metrics.tobytes()),
+            "sources": Binary(self.sources.tobytes()),
+        }
+
+    def merge_doc(self, doc: dict):
+        """Adds a snapshotted rollup (to_doc output) into this one."""
+        if doc.get("step") != self.step:
+            return  # resolution config changed; start fresh
+        slots = doc["slots"]
+        bucket = np.frombuffer(doc["bucket"], dtype=np.int64)
+        metrics = np.frombuffer(doc["metrics"], dtype=np.int64).reshape(slots, -1)
+        sources = np.frombuffer(doc["sources"], dtype=np.int64).reshape(slots, -1)
+        if metrics.shape[1] != len(METRICS) or sources.shape[1] != len(SOURCES):
+            return
+        # Re-slot by bucket id so a changed retention keeps what still fits;
+        # buckets older than the one already in a slot are out of the window
+        newest = max(int(self.bucket.max()), int(bucket.max()))
+        live = (bucket >= 0) & (bucket > newest - self.slots)
+        bucket, metrics, sources = bucket[live], metrics[live], sources[live]
+        target = bucket % self.slots
+        claim = bucket > self.bucket[target]
+        self.bucket[target[claim]] = bucket[claim]
+        self.metrics[target[claim]] = 0
+        self.sources[target[claim]] = 0
+        same = bucket == self.bucket[target]
+        self.metrics[target[same]] += metrics[same]
+        self.sources[target[same]] += sources[same]
+
+
+class AnalyticsStore:
+    """
+    Ingests batched tracking events into a columnar ring buffer and
+    minute/hour/day rollups. Reads only touch the rollups, so answering a
+    dashboard costs the same whatever the event volume. Rollups of the other
+    nodes (from their snapshots) are refreshed on the snapshot timer and
+    added in at read time.
+    """
+
+    def __init__(self, capacity: int = ANALYTICS_BUFFER_SIZE):
+        self.events = EventBuffer(capacity)
+        self.rollups = self._empty_rollups()
+        self.peers = self._empty_rollups()
+        self.ingested = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _empty_rollups() -> Dict[str, Rollup]:
+        return {name: Rollup(step, slots) for name, (step, slots) in RESOLUTIONS.items()}
+
+    def ingest(self, events: Sequence[dict]) -> Tuple[int, int]:
+        """
+        Adds events (dicts with type, ts, source, new_user, value) and returns
+        (accepted, dropped). Unknown types are dropped; unknown sources count
+        as "Other".
+        """
+        now = int(time.time())
+        rows = [e for e in events if e.get("type") in _TYPE_CODES]
+        if not rows:
+            return 0, len(events)
+
+        ts = np.fromiter(
+            (min(int(e.get("ts") or now), now) for e in rows), dtype=np.int64, count=len(rows)
+        )
+        types = np.fromiter(
+            (_TYPE_CODES[e["type"]] for e in rows), dtype=np.int64, count=len(rows)
+        )
+        other = _SOURCE_CODES["other"]
+        sources = np.fromiter(
+            (_SOURCE_CODES.get(str(e.get("source") or "direct").lower(), other) for e in rows),
+            dtype=np.int64,
+            count=len(rows),
+        )
+        new_user = np.fromiter(
+            (bool(e.get("new_user")) for e in rows), dtype=np.bool_, count=len(rows)
+        )
+        values = np.fromiter(
+            (float(e.get("value") or 0) for e in rows), dtype=np.float32, count=len(rows)
+        )
+
+        self.events.append(ts, types, sources, new_user, values)
+        too_old = self.rollups["day"].add(ts, types, sources, new_user)
+        for name in ("minute", "hour"):
+            self.rollups[name].add(ts, types, sources, new_user)
+
+        self.ingested += len(rows) - too_old
+        return len(rows) - too_old, len(events) - len(rows) + too_old
+
+    def retention(self, resolution: str) -> int:
+        """Seconds of history a resolution keeps."""
+        step, slots = RESOLUTIONS[resolution]
+        return step * slots
+
+    def series(self, resolution: str, count: int, end_ts: Optional[int] = None):
+        """
+        Per-bucket metrics/sources for the last `count` buckets up to end_ts,
+        across every node.
+        """
+        rollup = self.rollups[resolution]
+        end_bucket = int(end_ts if end_ts is not None else time.time()) // rollup.step
+        bucket_ids, metrics, sources = rollup.window(end_bucket - count + 1, count)
+        _, peer_metrics, peer_sources = self.peers[resolution].window(
+            end_bucket - count + 1, count
+        )
+        return bucket_ids, metrics + peer_metrics, sources + peer_sources
+
+    def overview(
+        self, resolution: str = "day", count: int = 7, end_ts: Optional[int] = None
+    ) -> dict:
+        bucket_ids, metrics, sources = self.series(resolution, count, end_ts)
+        step = self.rollups[resolution].step
+        totals = metrics.sum(axis=0)
+        source_totals = sources.sum(axis=0)
+        sessions = int(totals[METRICS.index("sessions")])
+        bounces = int(totals[METRICS.index("bounces")])
+        return {
+            "bucket_starts": bucket_ids * step,
+            "metrics": metrics,
+            "overview": {
+                "sessions": sessions,
+                "users": int(totals[_USERS]),
+                "bounceRate": round(bounces / sessions * 100, 2) if sessions else 0,
+                "conversions": int(totals[METRICS.index("conversions")]),
+            },
+            "trafficSources": sorted(
+                (
+                    {"name": name, "value": int(source_totals[i])}
+                    for i, name in enumerate(SOURCES)
+                ),
+                key=lambda s: s["value"],
+                reverse=True,
+            ),
+        }
+
+    # --- persistence ---
+    def _merge_snapshot(self, rollups: Dict[str, Rollup], doc: dict):
+        for name, rollup_doc in doc.get("rollups", {}).items():
+            if name in rollups:
+                rollups[name].merge_doc(rollup_doc)
+
+    async def load(self):
+        """Resumes this node's snapshot and takes over those of dead nodes."""
+        try:
+            doc = await load_analytics_snapshot(ANALYTICS_NODE_ID)
+            if doc:
+                self._merge_snapshot(self.rollups, doc)
+                self.ingested = doc.get("ingested", 0)
+            # Claimed atomically (deleted as read), so only one worker adopts
+            # each; saved right away as part of this node's snapshot
+            stale_before = datetime.utcnow() - timedelta(
+                seconds=ANALYTICS_NODE_STALE_SECONDS
+            )
+            adopted = 0
+            async for doc in claim_stale_analytics_snapshots(
+                ANALYTICS_NODE_ID, stale_before
+            ):
+                self._merge_snapshot(self.rollups, doc)
+                self.ingested += doc.get("ingested", 0)
+                adopted += 1
+            if adopted:
+                await self.snapshot()
+        except Exception as e:
+            print(f"⚠️ Could not load analytics snapshot: {e}")
+        await self.refresh_peers()
+
+    async def refresh_peers(self):
+        """Rebuilds the merged rollups of every other node from their snapshots."""
+        peers = self._empty_rollups()
+        try:
+            async for doc in load_peer_analytics_snapshots(ANALYTICS_NODE_ID):
+                self._merge_snapshot(peers, doc)
+        except Exception as e:
+            print(f"⚠️ Could not load peer analytics snapshots: {e}")
+            return
+        self.peers = peers
+
+    async def snapshot(self):
+        """Persists the rollups (raw events are not snapshotted)."""
+        await save_analytics_snapshot(
+            ANALYTICS_NODE_ID,
+            {
+                "rollups": {name: r.to_doc() for name, r in self.rollups.items()},
+                "ingested": self.ingested,
+            },
+        )
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(ANALYTICS_SNAPSHOT_SECONDS)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                print(f"⚠️ Analytics snapshot failed: {e}")
+            await self.refresh_peers()
+
+    async def start(self):
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.snapshot()
+        except Exception as e:
+            print(f"⚠️ Final analytics snapshot failed: {e}")
+
+
+analytics_store = AnalyticsStore()
@@ -0,0 +1,90 @@
+import asyncio
+import os
+import time
+from typing import AsyncIterator, List, Optional
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from services.analysis_cache import analyze_url_cached, normalize_url
+from services.http_client import HostLimiter
+from services.report_writer import report_writer
+
+load_dotenv()
+
+# --- Config ---
+BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "500"))
+# Analyses running at once across every batch in this process
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "16"))
+# ...and against any single host, so one site isn't hammered
+BATCH_PER_HOST = int(os.getenv("BATCH_PER_HOST", "2"))
+
+
+_global_limit = asyncio.Semaphore(BATCH_CONCURRENCY)
+_host_limiter = HostLimiter(BATCH_PER_HOST)
+
+
+async def _analyze_one(
+    index: int, url: str, user_id: Optional[str], bypass_cache: bool
+) -> dict:
+    host = urlsplit(normalize_url(url)).hostname or ""
+    # Host slot first, so a URL waiting on a busy host doesn't hold a
+    # global slot that another host could use
+    async with _host_limiter.slot(host):
+        async with _global_limit:
+            start = time.perf_counter()
+            try:
+                result, cache_info = await analyze_url_cached(
+                    url, bypass_cache=bypass_cache
+                )
+            except Exception as e:
+                result, cache_info = {"error": str(e)}, None
+            elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+
+    if result.get("error"):
+        return {"index": index, "url": url, "status": "error", "error": result["error"]}
+    if user_id:
+        # The write-behind buffer turns these into batched insert_many calls
+        await report_writer.submit(user_id, url, result)
+    return {
+        "index": index,
+        "url": url,
+        "status": "ok",
+        "elapsed_ms": elapsed_ms,
+        "result": {**result, "cache": cache_info},
+    }
+
+
+async def analyze_batch(
+    urls: List[str], user_id: Optional[str] = None, bypass_cache: bool = False
+) -> AsyncIterator[dict]:
+    """
+    Analyzes many URLs concurrently and yields one item per URL as soon as
+    it finishes (`index` is its position in `urls`), then a final summary
+    item with "done": True. Duplicate URLs in one batch share a single run
+    through the analysis cache's single-flight. If the consumer stops
+    early, outstanding analyses are cancelled.
+    """
+    start = time.perf_counter()
+    tasks = [
+        asyncio.ensure_future(_analyze_one(i, url, user_id, bypass_cache))
+        for i, url in enumerate(urls)
+    ]
+    succeeded = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            succeeded += item["status"] == "ok"
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    yield {
+        "done": True,
+        "total": len(urls),
+        "succeeded": succeeded,
+        "failed": len(urls) - succeeded,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import os
+from collections import deque
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Config ---
+SSE_CLIENT_QUEUE_SIZE = int(os.getenv("SSE_CLIENT_QUEUE_SIZE", "8"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Frames kept per topic so reconnecting clients can resume via Last-Event-ID
+SSE_REPLAY_BUFFER = int(os.getenv("SSE_REPLAY_BUFFER", "50"))
+# Delta topics send a full snapshot every N frames, deltas in between
+SSE_SNAPSHOT_EVERY = int(os.getenv("SSE_SNAPSHOT_EVERY", "12"))
+
+HEARTBEAT_FRAME = b": ping\n\n"
+
+Producer = Callable[[], Awaitable[Any]]
+
+
+def format_sse(data: Any, event: str = "update", event_id: Optional[int] = None) -> bytes:
+    """Serializes one Server-Sent Events frame."""
+    payload = data if isinstance(data, str) else json.dumps(data, default=str)
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in payload.splitlines() or [""])
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+def _is_series(value: Any) -> bool:
+    return (
+        isinstance(value, list)
+        and bool(value)
+        and all(isinstance(p, dict) and "time" in p for p in value)
+    )
+
+
+def apply_series_patch(series: List[dict], patch: dict) -> List[dict]:
+    """Upserts `$points` by time, then keeps the newest `$len` points."""
+    merged = {p["time"]: p for p in series}
+    for point in patch["$points"]:
+        merged[point["time"]] = point
+    points = sorted(merged.values(), key=lambda p: p["time"])
+    return points[max(0, len(points) - patch["$len"]) :]
+
+
+def diff_payload(prev: Any, cur: Any) -> Any:
+    """
+    JSON Merge Patch (RFC 7386) from prev to cur: unchanged keys are left
+    out, removed keys become null. Timeseries lists ([{time, value}, ...])
+    are sent as {"$points": new or changed points, "$len": window length}
+    rather than in full.
+    """
+    if isinstance(prev, dict) and isinstance(cur, dict):
+        patch = {k: None for k in prev if k not in cur}
+        for key, value in cur.items():
+            if key not in prev:
+                patch[key] = value
+            elif prev[key] != value:
+                patch[key] = diff_payload(prev[key], value)
+        return patch
+    if _is_series(prev) and _is_series(cur):
+        known = {p["time"]: p for p in prev}
+        patch = {
+            "$points": [p for p in cur if known.get(p["time"]) != p],
+            "$len": len(cur),
+        }
+        # Downsampled series can pick different times; then resend it whole
+        if apply_series_patch(prev, patch) == cur:
+            return patch
+    return cur
+
+
+class DeltaEncoder:
+    """Turns successive full payloads into snapshot/delta frame bodies."""
+
+    def __init__(self, snapshot_every: int):
+        self.snapshot_every = snapshot_every
+        self.state: Any = None
+        self._since_snapshot = 0
+
+    def encode(self, payload: Any) -> Optional[Tuple[str, dict]]:
+        """(event, body) for the next frame, or None if nothing changed."""
+        prev, self.state = self.state, payload
+        if prev is None or self._since_snapshot + 1 >= self.snapshot_every:
+            self._since_snapshot = 0
+            return "snapshot", {"data": payload}
+        patch = diff_payload(prev, payload)
+        if patch == {}:
+            return None
+        self._since_snapshot += 1
+        return "delta", {"patch": patch}
+
+
+class _Subscriber:
+    def __init__(self, queue_size: int, resync: Optional[Callable[[], bytes]] = None):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.resync = resync
+        self.dropped = 0
+
+    def push(self, frame: bytes):
+        if self.queue.full() and self.resync is not None:
+            # A dropped delta would corrupt the client's state: replace the
+            # whole backlog with one snapshot of the current state instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+                self.dropped += 1
+            self.queue.put_nowait(self.resync())
+            return
+        # Slow consumer: drop its oldest pending frame rather than block the
+        # producer or grow without bound
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        self.queue.put_nowait(frame)
+
+
+class _Topic:
+    def __init__(
+        self,
+        name: str,
+        producer: Producer,
+        interval: float,
+        event: str,
+        snapshot_every: Optional[int] = None,
+    ):
+        self.name = name
+        self.producer = producer
+        self.interval = interval
+        self.event = event
+        self.encoder = DeltaEncoder(snapshot_every) if snapshot_every else None
+        self.subscribers: Set[_Subscriber] = set()
+        self.history: Deque[Tuple[int, bytes]] = deque(maxlen=SSE_REPLAY_BUFFER)
+        self.last_id = 0
+        self.task: Optional[asyncio.Task] = None
+        self._snapshot: Optional[Tuple[int, bytes]] = None
+
+    def snapshot_frame(self) -> bytes:
+        """Full current state of a delta topic, serialized once per frame id."""
+        if self._snapshot is None or self._snapshot[0] != self.last_id:
+            body = {"seq": self.last_id, "data": self.encoder.state}
+            self._snapshot = (self.last_id, format_sse(body, "snapshot", self.last_id))
+        return self._snapshot[1]
+
+    def can_resume(self, last_event_id: Optional[str]) -> bool:
+        if not last_event_id or not last_event_id.isdigit():
+            return False
+        last = int(last_event_id)
+        if last == self.last_id:
+            return True
+        return bool(self.history) and self.history[0][0] <= last + 1 <= self.last_id
+
+    def publish(self, data: Any, event: Optional[str] = None):
+        """Serializes once and fans the same bytes out to every subscriber."""
+        if self.encoder is not None:
+            encoded = self.encoder.encode(data)
+            if encoded is None:
+                return
+            event, body = encoded
+            # seq lets clients spot a missed frame and resync
+            data = {"seq": self.last_id + 1, **body}
+        self.last_id += 1
+        frame = format_sse(data, event or self.event, self.last_id)
+        self.history.append((self.last_id, frame))
+        for subscriber in list(self.subscribers):
+            subscriber.push(frame)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                self.publish(await self.producer())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Broadcast producer '{self.name}' failed: {e}")
+
+
+class BroadcastHub:
+    """
+    One producer task per topic computes and serializes each update once;
+    every connected client just receives the shared bytes through its own
+    bounded queue. Producers only run while a topic has subscribers.
+    """
+
+    def __init__(self):
+        self._topics: Dict[str, _Topic] = {}
+
+    def register(
+        self,
+        topic: str,
+        producer: Producer,
+        interval: float,
+        event: str = "update",
+        delta: bool = False,
+    ):
+        """
+        With delta=True the producer still returns full payloads, but clients
+        get "snapshot" and "delta" events carrying a `seq` number instead.
+        """
+        self._topics[topic] = _Topic(
+            topic, producer, interval, event, SSE_SNAPSHOT_EVERY if delta else None
+        )
+
+    def publish(self, topic: str, data: Any, event: Optional[str] = None):
+        self._topics[topic].publish(data, event)
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._topics[topic].subscribers)
+
+    async def subscribe(
+        self, topic_name: str, last_event_id: Optional[str] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Yields SSE frames for one client: missed frames after
+        `last_event_id` first, then live frames, with heartbeats in between.
+        """
+        topic = self._topics[topic_name]
+        subscriber = _Subscriber(
+            SSE_CLIENT_QUEUE_SIZE,
+            topic.snapshot_frame if topic.encoder is not None else None,
+        )
+
+        if topic.encoder is not None and not topic.can_resume(last_event_id):
+            # New client, or one that missed more than the replay buffer
+            if topic.encoder.state is not None:
+                subscriber.push(topic.snapshot_frame())
+        elif last_event_id and last_event_id.isdigit():
+            for frame_id, frame in topic.history:
+                if frame_id > int(last_event_id):
+                    subscriber.push(frame)
+
+        topic.subscribers.add(subscriber)
+        if topic.task is None or topic.task.done():
+            topic.task = asyncio.create_task(topic.run())
+
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(
+                        subscriber.queue.get(), SSE_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT_FRAME
+        finally:
+            topic.subscribers.discard(subscriber)
+            if not topic.subscribers and topic.task is not None:
+                topic.task.cancel()
+                topic.task = None
+
+    async def stop(self):
+        for topic in self._topics.values():
+            if topic.task is not None:
+                topic.task.cancel()
+                topic.task = None
+
+
+hub = BroadcastHub()
@@ -0,0 +1,230 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from dotenv import load_dotenv
+from playwright.async_api import Browser, Playwright, async_playwright
+
+load_dotenv()
+
+# --- Config ---
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+# How many isolated contexts one Chromium may serve at the same time
+BROWSER_MAX_CONTEXTS = int(os.getenv("BROWSER_MAX_CONTEXTS", "4"))
+# Recycle a browser after it has served this many pages ...
+BROWSER_MAX_PAGES = int(os.getenv("BROWSER_MAX_PAGES", "200"))
+# ... or once its process tree grows beyond this resident size
+BROWSER_MAX_RSS_MB = int(os.getenv("BROWSER_MAX_RSS_MB", "800"))
+# How often resident size is sampled (off the request path)
+BROWSER_RSS_CHECK_SECONDS = int(os.getenv("BROWSER_RSS_CHECK_SECONDS", "30"))
+BROWSER_LAUNCH_ARGS = ["--no-sandbox", "--disable-dev-shm-usage"]
+
+
+def _rss_mb(pids: List[int]) -> float:
+    """Sums the resident memory of the given pids (Linux /proc only)."""
+    page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, ValueError, IndexError):
+            continue
+    return total / (1024 * 1024)
+
+
+class _PooledBrowser:
+    """One long-lived Chromium plus the bookkeeping needed to recycle it."""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.active = 0
+        self.pages_served = 0
+        self.retiring = False
+        self.crashed = False
+        browser.on("disconnected", self._on_disconnected)
+
+    def _on_disconnected(self, *_):
+        self.crashed = True
+
+    @property
+    def usable(self) -> bool:
+        return (
+            not self.crashed and not self.retiring and self.browser.is_connected()
+        )
+
+    async def rss_mb(self) -> float:
+        try:
+            session = await self.browser.new_browser_cdp_session()
+            info = await session.send("SystemInfo.getProcessInfo")
+            await session.detach()
+        except Exception:
+            return 0.0
+        return _rss_mb([p["id"] for p in info.get("processInfo", [])])
+
+    async def close(self):
+        try:
+            await self.browser.close()
+        except Exception:
+            pass
+
+
+class BrowserPool:
+    """
+    Keeps a fixed number of Chromium instances alive for the lifetime of the
+    app and hands out a fresh, isolated browser context for every analysis.
+    Browsers are replaced when they crash or have served too many pages /
+    grown too large.
+    """
+
+    def __init__(
+        self,
+        size: int = BROWSER_POOL_SIZE,
+        max_contexts: int = BROWSER_MAX_CONTEXTS,
+        max_pages: int = BROWSER_MAX_PAGES,
+        max_rss_mb: int = BROWSER_MAX_RSS_MB,
+    ):
+        self.size = max(1, size)
+        self.max_contexts = max(1, max_contexts)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[_PooledBrowser] = []
+        self._slots = asyncio.Semaphore(self.size * self.max_contexts)
+        self._lock = asyncio.Lock()
+        self._started = False
+        self._monitor: Optional[asyncio.Task] = None
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    async def start(self):
+        """Launches the playwright driver and the initial set of browsers."""
+        async with self._lock:
+            if self._started:
+                return
+            self._playwright = await async_playwright().start()
+            try:
+                for _ in range(self.size):
+                    self._browsers.append(await self._launch())
+            except Exception:
+                # Don't leave a half-started driver behind
+                for pooled in self._browsers:
+                    await pooled.close()
+                self._browsers = []
+                await self._playwright.stop()
+                self._playwright = None
+                raise
+            self._started = True
+            self._monitor = asyncio.create_task(self._watch_memory())
+        print(f"🌐 Browser pool started with {self.size} browser(s).")
+
+    async def stop(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            try:
+                await self._monitor
+            except asyncio.CancelledError:
+                pass
+            self._monitor = None
+        async with self._lock:
+            for pooled in self._browsers:
+                await pooled.close()
+            self._browsers = []
+            if self._playwright:
+                await self._playwright.stop()
+                self._playwright = None
+            self._started = False
+
+    async def _launch(self) -> _PooledBrowser:
+        browser = await self._playwright.chromium.launch(
+            headless=True, args=BROWSER_LAUNCH_ARGS
+        )
+        return _PooledBrowser(browser)
+
+    async def _acquire(self) -> _PooledBrowser:
+        async with self._lock:
+            # Replace crashed browsers and retired browsers that have drained
+            for i, pooled in enumerate(self._browsers):
+                if pooled.crashed or (pooled.retiring and pooled.active == 0):
+                    if pooled.crashed:
+                        print("⚠️ Browser crashed, relaunching.")
+                    await pooled.close()
+                    self._browsers[i] = await self._launch()
+
+            candidates = [b for b in self._browsers if b.usable]
+            if not candidates:
+                # Everything is retiring but still busy: add a temporary spare
+                spare = await self._launch()
+                self._browsers.append(spare)
+                candidates = [spare]
+
+            pooled = min(candidates, key=lambda b: b.active)
+            pooled.active += 1
+            pooled.pages_served += 1
+            return pooled
+
+    async def _release(self, pooled: _PooledBrowser):
+        # Decided under the lock so _acquire never hands out a browser that
+        # is about to be closed
+        async with self._lock:
+            pooled.active -= 1
+            if pooled.pages_served >= self.max_pages:
+                pooled.retiring = True
+            if pooled.active == 0 and (pooled.retiring or pooled.crashed):
+                await self._replace(pooled)
+
+    async def _replace(self, pooled: _PooledBrowser):
+        """Closes a drained browser; relaunches it unless it was a spare."""
+        if pooled not in self._browsers:
+            return
+        await pooled.close()
+        if len(self._browsers) > self.size:
+            self._browsers.remove(pooled)
+        else:
+            self._browsers[self._browsers.index(pooled)] = await self._launch()
+
+    async def _watch_memory(self):
+        """Periodically retires browsers whose process tree grew too large."""
+        while True:
+            await asyncio.sleep(BROWSER_RSS_CHECK_SECONDS)
+            for pooled in [b for b in self._browsers if b.usable]:
+                if await pooled.rss_mb() <= self.max_rss_mb:
+                    continue
+                try:
+                    async with self._lock:
+                        pooled.retiring = True
+                        if pooled.active == 0:
+                            await self._replace(pooled)
+                except Exception as e:
+                    print(f"⚠️ Could not recycle oversized browser: {e}")
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """
+        Yields a new page inside its own browser context. The context (cookies,
+        cache, storage) is thrown away when the block exits.
+        """
+        if not self._started:
+            await self.start()
+
+        async with self._slots:
+            pooled = await self._acquire()
+            context = None
+            try:
+                context = await pooled.browser.new_context(**context_options)
+                yield await context.new_page()
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception:
+                        pass
+                # Shielded: a cancelled request must still give its slot back
+                await asyncio.shield(self._release(pooled))
+
+
+# Shared pool, started/stopped from main.py
+browser_pool = BrowserPool()
@@ -0,0 +1,272 @@
+import asyncio
+import os
+import posixpath
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from urllib.parse import urljoin, urlsplit
+from urllib.robotparser import RobotFileParser
+
+from database import (
+    build_crawl_page_document,
+    build_crawl_report,
+    create_crawl,
+    save_crawl_pages,
+    update_crawl,
+)
+from dotenv import load_dotenv
+
+from services import http_client
+from services.analysis_cache import normalize_url
+from services.seo_service import REQUEST_HEADERS, analyze_page
+
+load_dotenv()
+
+# --- Config ---
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "500"))
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "10"))
+# Pages analyzed at once within one crawl
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+# Minimum gap between two page fetches on the same host (robots.txt
+# Crawl-delay raises it, up to CRAWL_MAX_DELAY)
+CRAWL_DELAY_SECONDS = float(os.getenv("CRAWL_DELAY_SECONDS", "0.5"))
+CRAWL_MAX_DELAY = float(os.getenv("CRAWL_MAX_DELAY", "10"))
+# Crawls running at once in this process; the rest wait their turn
+CRAWL_MAX_ACTIVE = int(os.getenv("CRAWL_MAX_ACTIVE", "2"))
+# Page results are written in batches of this size
+CRAWL_WRITE_BATCH = int(os.getenv("CRAWL_WRITE_BATCH", "25"))
+# Running crawls touch their document this often, however slow the pages
+CRAWL_HEARTBEAT_SECONDS = int(os.getenv("CRAWL_HEARTBEAT_SECONDS", "30"))
+# A "running" crawl not updated for this long was lost with its process
+CRAWL_STALE_SECONDS = int(os.getenv("CRAWL_STALE_SECONDS", "300"))
+
+ROBOTS_AGENT = "SEOtron"
+_SKIP_EXTENSIONS = {
+    ".7z", ".avi", ".css", ".csv", ".doc", ".docx", ".exe", ".gif", ".gz",
+    ".ico", ".jpeg", ".jpg", ".js", ".json", ".mov", ".mp3", ".mp4", ".pdf",
+    ".png", ".ppt", ".pptx", ".rar", ".svg", ".tar", ".txt", ".webp", ".woff",
+    ".woff2", ".xls", ".xlsx", ".xml", ".zip",
+}
+
+
+def _site_of(url: str) -> str:
+    """Host without a leading www., so example.com and www.example.com match."""
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class HostThrottle:
+    """Spaces out requests to each host; shared by every crawl in the process."""
+
+    def __init__(self):
+        self._next: Dict[str, float] = {}
+
+    async def wait(self, host: str, delay: float):
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        if len(self._next) > 1000:  # forget hosts nobody is waiting on
+            self._next = {h: t for h, t in self._next.items() if t > now}
+        at = max(now, self._next.get(host, 0.0))
+        self._next[host] = at + delay
+        await asyncio.sleep(at - now)
+
+
+host_throttle = HostThrottle()
+
+
+async def _load_robots(seed: str) -> Optional[RobotFileParser]:
+    parts = urlsplit(seed)
+    try:
+        res = await http_client.get(
+            f"{parts.scheme}://{parts.netloc}/robots.txt",
+            retries=0,
+            headers=REQUEST_HEADERS,
+        )
+    except Exception:
+        return None
+    if res.status_code >= 400:
+        return None  # no robots.txt: everything is allowed
+    robots = RobotFileParser()
+    robots.parse(res.text.splitlines())
+    return robots
+
+
+class SiteCrawler:
+    """
+    Breadth-first crawl of one site. A FIFO queue feeds CRAWL_CONCURRENCY
+    workers, so pages are analyzed concurrently in roughly depth order.
+    Memory stays bounded by max_pages: only scheduled URLs are remembered
+    and page results go to MongoDB in batches as they finish.
+    """
+
+    def __init__(self, crawl_id: str, seed: str, max_pages: int, max_depth: int):
+        self.crawl_id = crawl_id
+        self.seed = normalize_url(seed)
+        self.site = _site_of(self.seed)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.robots: Optional[RobotFileParser] = None
+        self.delay = CRAWL_DELAY_SECONDS
+        self.seen: Set[str] = set()  # scheduled or fetched, normalized
+        self.fetched: Set[str] = set()  # final/canonical URLs of analyzed pages
+        self.scheduled = 0
+        self._queue: asyncio.Queue = asyncio.Queue()  # (url, depth, found_on)
+        self._buffer: List[dict] = []
+        self._write_lock = asyncio.Lock()
+
+    def _allowed(self, url: str) -> bool:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or _site_of(url) != self.site:
+            return False
+        if posixpath.splitext(parts.path)[1].lower() in _SKIP_EXTENSIONS:
+            return False
+        return self.robots is None or self.robots.can_fetch(ROBOTS_AGENT, url)
+
+    def _schedule(self, url: str, depth: int, found_on: Optional[str]) -> bool:
+        if self.scheduled >= self.max_pages or depth > self.max_depth:
+            return False
+        if url in self.seen or not self._allowed(url):
+            return True
+        self.seen.add(url)
+        self.scheduled += 1
+        self._queue.put_nowait((url, depth, found_on))
+        return True
+
+    async def run(self) -> dict:
+        workers: List[asyncio.Task] = []
+        try:
+            self.robots = await _load_robots(self.seed)
+            if self.robots is not None:
+                crawl_delay = self.robots.crawl_delay(ROBOTS_AGENT)
+                if crawl_delay:
+                    self.delay = min(max(self.delay, float(crawl_delay)), CRAWL_MAX_DELAY)
+
+            self._schedule(self.seed, 0, None)
+            workers = [
+                asyncio.create_task(self._work()) for _ in range(CRAWL_CONCURRENCY)
+            ]
+            await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            await self._flush()
+        return await build_crawl_report(self.crawl_id)
+
+    async def _work(self):
+        while True:
+            url, depth, found_on = await self._queue.get()
+            try:
+                await self._crawl_page(url, depth, found_on)
+            except Exception as e:
+                print(f"⚠️ Crawl of {url} failed: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _crawl_page(self, url: str, depth: int, found_on: Optional[str]):
+        await host_throttle.wait(urlsplit(url).hostname or "", self.delay)
+        result = await analyze_page(url)
+
+        # Redirect targets and rel=canonical are aliases of this page
+        aliases = {normalize_url(result.get("final_url") or url)}
+        canonical = (result.get("metaTags") or {}).get("canonical")
+        if canonical:
+            aliases.add(normalize_url(urljoin(url, canonical)))
+        aliases.discard(url)
+        duplicate_of = next((alias for alias in aliases if alias in self.fetched), None)
+        self.fetched.add(url)
+        self.fetched.update(aliases)
+        self.seen.update(aliases)
+        if duplicate_of:
+            result["duplicate_of"] = duplicate_of
+
+        robots_meta = (result.get("metaTags") or {}).get("robots") or ""
+        if not result.get("error") and not duplicate_of and "nofollow" not in robots_meta:
+            links = result.get("links") or {}
+            nofollow = set(links.get("nofollow") or [])
+            for link in sorted(links.get("internal") or []):
+                if link in nofollow:
+                    continue
+                if not self._schedule(normalize_url(link), depth + 1, url):
+                    break  # page or depth limit reached
+
+        await self._store(
+            await build_crawl_page_document(self.crawl_id, url, depth, found_on, result)
+        )
+
+    async def _store(self, page: dict):
+        self._buffer.append(page)
+        if len(self._buffer) >= CRAWL_WRITE_BATCH:
+            await self._flush()
+
+    async def _flush(self):
+        async with self._write_lock:
+            pages, self._buffer = self._buffer, []
+            if not pages:
+                return
+            await save_crawl_pages(pages)
+            await update_crawl(self.crawl_id, {}, inc={"pages_crawled": len(pages)})
+
+
+class CrawlManager:
+    """Runs crawls as background tasks, at most CRAWL_MAX_ACTIVE at a time."""
+
+    def __init__(self, max_active: int = CRAWL_MAX_ACTIVE):
+        self._slots = asyncio.Semaphore(max_active)
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(self, user_id: str, seed: str, max_pages: int, max_depth: int) -> str:
+        crawl_id = await create_crawl(user_id, seed, max_pages, max_depth)
+        task = asyncio.create_task(self._run(crawl_id, seed, max_pages, max_depth))
+        self._tasks[crawl_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(crawl_id, None))
+        return crawl_id
+
+    @staticmethod
+    async def _heartbeat(crawl_id: str):
+        # Keeps updated_at fresh while the crawl waits for a slot and while
+        # it runs (page results are written in batches), so only crawls
+        # whose process is gone look stale (see CRAWL_STALE_SECONDS)
+        while True:
+            await asyncio.sleep(CRAWL_HEARTBEAT_SECONDS)
+            try:
+                await update_crawl(crawl_id, {})
+            except Exception as e:
+                print(f"⚠️ Crawl {crawl_id} heartbeat failed: {e}")
+
+    async def _run(self, crawl_id: str, seed: str, max_pages: int, max_depth: int):
+        heartbeat = asyncio.create_task(self._heartbeat(crawl_id))
+        try:
+            # Waiting for a slot is inside the try, so a crawl cancelled while
+            # still queued is marked interrupted too
+            async with self._slots:
+                await update_crawl(
+                    crawl_id, {"status": "running", "started_at": datetime.utcnow()}
+                )
+                report = await SiteCrawler(crawl_id, seed, max_pages, max_depth).run()
+        except asyncio.CancelledError:
+            await update_crawl(
+                crawl_id, {"status": "interrupted", "finished_at": datetime.utcnow()}
+            )
+            raise
+        except Exception as e:
+            print(f"❌ Crawl {crawl_id} failed: {e}")
+            await update_crawl(
+                crawl_id,
+                {"status": "failed", "error": str(e), "finished_at": datetime.utcnow()},
+            )
+            return
+        finally:
+            heartbeat.cancel()
+        await update_crawl(
+            crawl_id,
+            {"status": "done", "report": report, "finished_at": datetime.utcnow()},
+        )
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+crawl_manager = CrawlManager()
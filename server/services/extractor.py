@@ -0,0 +1,305 @@
+import os
+from html.parser import HTMLParser
+from typing import Callable, Dict, List, Optional, Set, Union
+from urllib.parse import urljoin, urlparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Config ---
+# "lxml" (default), "selectolax" or "html.parser" (stdlib, always available)
+EXTRACTOR_BACKEND = os.getenv("EXTRACTOR_BACKEND", "lxml")
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+# Text inside these never counts towards the page's words
+NON_TEXT_TAGS = {"script", "style", "template"}
+LONG_IMAGE_NAME = 50
+
+
+class _Collector:
+    """
+    Receives start/data/end events from any parser backend and fills in every
+    SEO field in a single sweep over the document. Method names follow the
+    lxml parser-target interface so it can be handed to lxml directly.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.host = urlparse(base_url).netloc
+
+        self.title: Optional[List[str]] = None
+        self.meta: Dict[str, Optional[str]] = {}
+        self.canonical: Optional[str] = None
+        self.favicon: Optional[str] = None
+        self._link_rels: Set[str] = set()  # rels whose first <link> was seen
+        self.headings: Dict[str, List[str]] = {tag: [] for tag in HEADING_TAGS}
+        self.paragraph_count = 0
+        self.images: List[Dict[str, Optional[str]]] = []
+        self.anchors: List[tuple] = []
+        self.structured_data: List[str] = []
+
+        self.word_count = 0
+        self._mid_word = False
+        self._skip_depth = 0
+        # Open elements whose text we are capturing: [tag, kind, pieces]
+        self._captures: List[list] = []
+
+    # --- parser target interface ---
+    def start(self, tag: str, attrs):
+        tag = tag.lower()
+        if tag in NON_TEXT_TAGS:
+            self._skip_depth += 1
+
+        if tag == "title":
+            if self.title is None:
+                self.title = []
+                self._captures.append([tag, "title", self.title])
+        elif tag in HEADING_TAGS:
+            self._captures.append([tag, tag, []])
+        elif tag == "p":
+            self.paragraph_count += 1
+        elif tag == "meta":
+            name = attrs.get("name")
+            if name in ("description", "keywords", "robots") and name not in self.meta:
+                self.meta[name] = attrs.get("content")
+        elif tag == "link":
+            rel = (attrs.get("rel") or "").split()
+            # Only the first matching <link> counts, even without an href
+            if "canonical" in rel and "canonical" not in self._link_rels:
+                self._link_rels.add("canonical")
+                self.canonical = attrs.get("href")
+            if "icon" in rel and "icon" not in self._link_rels:
+                self._link_rels.add("icon")
+                self.favicon = attrs.get("href")
+        elif tag == "img":
+            self.images.append(
+                {
+                    "src": attrs.get("src"),
+                    "alt": attrs.get("alt"),
+                    "width": attrs.get("width"),
+                    "height": attrs.get("height"),
+                }
+            )
+        elif tag == "a":
+            href = attrs.get("href")
+            if href is not None:
+                rel = (attrs.get("rel") or "").split()
+                self.anchors.append((href, "nofollow" in rel))
+        elif tag == "script" and attrs.get("type") == "application/ld+json":
+            self._captures.append([tag, "ld+json", []])
+
+    def end(self, tag: str):
+        tag = tag.lower()
+        if tag in NON_TEXT_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+        # Close the innermost matching capture (tolerates unclosed children)
+        for i in range(len(self._captures) - 1, -1, -1):
+            if self._captures[i][0] == tag:
+                for _, kind, pieces in self._captures[i:]:
+                    self._finish_capture(kind, pieces)
+                del self._captures[i:]
+                break
+
+    def data(self, text: str):
+        if not text:
+            return
+        for capture in self._captures:
+            capture[2].append(text)
+        if self._skip_depth:
+            return
+
+        # Count words across chunk boundaries the way "".join(...).split() would
+        words = len(text.split())
+        if words and self._mid_word and not text[0].isspace():
+            words -= 1
+        self.word_count += words
+        self._mid_word = not text[-1].isspace()
+
+    def comment(self, text: str):
+        pass
+
+    def close(self) -> dict:
+        for _, kind, pieces in self._captures:
+            self._finish_capture(kind, pieces)
+        self._captures = []
+        return self.result()
+
+    # --- helpers ---
+    def _finish_capture(self, kind: str, pieces: List[str]):
+        if kind in HEADING_TAGS:
+            self.headings[kind].append("".join(p.strip() for p in pieces))
+        elif kind == "ld+json":
+            self.structured_data.append("".join(pieces))
+
+    def result(self) -> dict:
+        description = self.meta.get("description")
+        description = description.strip() if description else None
+        raw_keywords = self.meta.get("keywords")
+        keywords = (
+            [kw.strip() for kw in (raw_keywords or "").split(",") if kw]
+            if "keywords" in self.meta
+            else []
+        )
+        robots = self.meta.get("robots")
+
+        internal, external, nofollow, mailto, tel = set(), set(), set(), set(), set()
+        for href, is_nofollow in self.anchors:
+            abs_url = urljoin(self.base_url, href)
+            if abs_url.startswith("mailto:"):
+                mailto.add(abs_url)
+            elif abs_url.startswith("tel:"):
+                tel.add(abs_url)
+            elif self.host in abs_url:
+                internal.add(abs_url)
+            else:
+                external.add(abs_url)
+            if is_nofollow:
+                nofollow.add(abs_url)
+
+        images = self.images
+        return {
+            "title": "".join(self.title).strip() if self.title is not None else "No Title",
+            "metaTags": {
+                "description": description,
+                "keywords": ", ".join(keywords) if keywords else None,
+                "robots": robots.lower() if robots else None,
+                "canonical": self.canonical,
+                "favicon": urljoin(self.base_url, self.favicon) if self.favicon else None,
+            },
+            "headings": self.headings,
+            "content": {
+                "word_count": self.word_count,
+                "paragraph_count": self.paragraph_count,
+                "image_count": len(images),
+                "images_without_alt": [i["src"] for i in images if not i["alt"]],
+                "images_missing_dimensions": [
+                    i["src"] for i in images if not i["width"] or not i["height"]
+                ],
+                "images_long_names": [
+                    i["src"]
+                    for i in images
+                    if i["src"] and len(i["src"]) > LONG_IMAGE_NAME
+                ],
+            },
+            "links": {
+                "internal": list(internal),
+                "external": list(external),
+                "broken": [],
+                "nofollow": list(nofollow),
+                "mailto": list(mailto),
+                "tel": list(tel),
+            },
+            "structured_data": self.structured_data,
+            "keywords": keywords,
+        }
+
+
+# -------------------------------------------------
+# Backends: each one streams the document into a _Collector exactly once
+# -------------------------------------------------
+class _StdlibParser(HTMLParser):
+    def __init__(self, collector: _Collector):
+        super().__init__(convert_charrefs=True)
+        self.collector = collector
+
+    def handle_starttag(self, tag, attrs):
+        self.collector.start(tag, {k: (v if v is not None else "") for k, v in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        self.collector.end(tag)
+
+    def handle_endtag(self, tag):
+        self.collector.end(tag)
+
+    def handle_data(self, data):
+        self.collector.data(data)
+
+
+def _run_stdlib(html: str, collector: _Collector) -> dict:
+    parser = _StdlibParser(collector)
+    parser.feed(html)
+    parser.close()
+    return collector.close()
+
+
+def _run_lxml(html: str, collector: _Collector) -> dict:
+    from lxml import etree
+
+    # With a target, lxml never builds a tree; it just streams events
+    parser = etree.HTMLParser(target=collector, encoding="utf-8", huge_tree=True)
+    parser.feed(html.encode("utf-8"))
+    return parser.close()
+
+
+def _run_selectolax(html: str, collector: _Collector) -> dict:
+    from selectolax.parser import HTMLParser as SelectolaxParser
+
+    tree = SelectolaxParser(html)
+    if tree.root is None:
+        return collector.close()
+
+    # traverse() is a pre-order walk without end events, so synthesize them
+    # by tracking the chain of open ancestors.
+    open_nodes = []
+    for node in tree.root.traverse(include_text=True):
+        parent = node.parent
+        parent_id = parent.mem_id if parent is not None else None
+        while open_nodes and open_nodes[-1][0] != parent_id:
+            collector.end(open_nodes.pop()[1])
+        if node.tag == "-text":
+            collector.data(node.text_content or "")
+        elif not node.tag.startswith("-"):  # skip comments/doctype
+            collector.start(node.tag, {k: v or "" for k, v in node.attributes.items()})
+            open_nodes.append((node.mem_id, node.tag))
+    while open_nodes:
+        collector.end(open_nodes.pop()[1])
+    return collector.close()
+
+
+_BACKENDS: Dict[str, Callable[[str, _Collector], dict]] = {
+    "html.parser": _run_stdlib,
+    "lxml": _run_lxml,
+    "selectolax": _run_selectolax,
+}
+
+
+def _resolve_backend(name: str) -> str:
+    if name == "lxml":
+        try:
+            import lxml.etree  # noqa: F401
+        except ImportError:
+            return "html.parser"
+    elif name == "selectolax":
+        try:
+            import selectolax.parser  # noqa: F401
+        except ImportError:
+            return _resolve_backend("lxml")
+    elif name not in _BACKENDS:
+        return _resolve_backend("lxml")
+    return name
+
+
+DEFAULT_BACKEND = _resolve_backend(EXTRACTOR_BACKEND)
+
+
+def extract_page(
+    html: Union[str, bytes], base_url: str, backend: Optional[str] = None
+) -> dict:
+    """
+    Extracts title, meta tags, headings, content counters, images, links and
+    JSON-LD blocks in one pass over the markup. Returns the same shape as the
+    analyze_url result (minus performance/scores), plus `page_size_kb`.
+    """
+    if isinstance(html, bytes):
+        page_bytes = len(html)
+        html = html.decode("utf-8", errors="replace")
+    else:
+        page_bytes = len(html.encode("utf-8"))
+
+    backend = _resolve_backend(backend) if backend else DEFAULT_BACKEND
+    result = _BACKENDS[backend](html, _Collector(base_url))
+    result["page_size_kb"] = round(page_bytes / 1024, 2)
+    return result
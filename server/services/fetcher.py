@@ -0,0 +1,193 @@
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+from services import http_client
+from services.browser_pool import browser_pool
+
+load_dotenv()
+
+# --- Config ---
+HTTP_FETCH_TIMEOUT = float(os.getenv("HTTP_FETCH_TIMEOUT", "10"))
+RENDER_TIMEOUT_MS = int(os.getenv("RENDER_TIMEOUT_MS", "30000"))
+# How long we trust a per-host "needs JS" / "static" decision
+RENDER_DECISION_TTL = int(os.getenv("RENDER_DECISION_TTL", "86400"))
+RENDER_DECISION_MAX_HOSTS = 5000
+# Pages with less visible text than this are suspicious
+MIN_VISIBLE_TEXT_CHARS = 200
+
+# --- Heuristic patterns (run on raw HTML, no parsing needed) ---
+_SCRIPT_STYLE_RE = re.compile(
+    r"<(script|style|template|noscript)\b[^>]*>.*?</\1\s*>", re.I | re.S
+)
+_TAG_RE = re.compile(r"<[^>]+>")
+_BODY_RE = re.compile(r"<body\b[^>]*>(.*)</body\s*>", re.I | re.S)
+_EMPTY_ROOT_RE = re.compile(
+    r"<(div|main|section)\b[^>]*\bid=[\"']?(root|app|__next|__nuxt|svelte|main-app)[\"']?[^>]*>\s*</\1>",
+    re.I,
+)
+_APP_ROOT_RE = re.compile(r"<app-root\b[^>]*>\s*</app-root>", re.I)
+_NOSCRIPT_WARNING_RE = re.compile(
+    r"<noscript\b[^>]*>[^<]*(enable|requires?|need)[^<]*javascript", re.I
+)
+_FRAMEWORK_MARKERS = (
+    "data-reactroot",
+    "ng-version",
+    "window.__NUXT__",
+    "__INITIAL_STATE__",
+    "data-server-rendered",
+    "webpackJsonp",
+    "/_next/static/",
+    "data-v-app",
+)
+
+
+@dataclass
+class FetchResult:
+    html: str
+    headers: Dict[str, str] = field(default_factory=dict)
+    status_code: Optional[int] = None
+    final_url: Optional[str] = None
+    rendered: bool = False
+
+
+def _visible_text_length(html: str) -> int:
+    body_match = _BODY_RE.search(html)
+    body = body_match.group(1) if body_match else html
+    body = _SCRIPT_STYLE_RE.sub(" ", body)
+    return len(" ".join(_TAG_RE.sub(" ", body).split()))
+
+
+def needs_js_rendering(html: str) -> bool:
+    """
+    Decides from raw HTML whether the page only makes sense after running
+    its JavaScript (client-rendered SPA shells, "enable JavaScript" pages).
+    """
+    if not html or not html.strip():
+        return True
+
+    if _EMPTY_ROOT_RE.search(html) or _APP_ROOT_RE.search(html):
+        return True
+
+    thin_body = _visible_text_length(html) < MIN_VISIBLE_TEXT_CHARS
+    if thin_body and _NOSCRIPT_WARNING_RE.search(html):
+        return True
+
+    # Framework markers alone are fine (SSR sites have them too); they only
+    # tip the decision when the server sent next to no content.
+    has_framework = any(marker in html for marker in _FRAMEWORK_MARKERS)
+    return thin_body and has_framework
+
+
+class _RenderDecisions:
+    """Remembers per host whether its pages needed a headless render."""
+
+    def __init__(self, ttl: int, max_hosts: int):
+        self.ttl = ttl
+        self.max_hosts = max_hosts
+        self._decisions: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, host: str) -> Optional[bool]:
+        entry = self._decisions.get(host)
+        if entry is None:
+            return None
+        needs_render, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self._decisions[host]
+            return None
+        self._decisions.move_to_end(host)
+        return needs_render
+
+    def set(self, host: str, needs_render: bool):
+        self._decisions[host] = (needs_render, time.monotonic())
+        self._decisions.move_to_end(host)
+        while len(self._decisions) > self.max_hosts:
+            self._decisions.popitem(last=False)
+
+
+render_decisions = _RenderDecisions(RENDER_DECISION_TTL, RENDER_DECISION_MAX_HOSTS)
+
+
+async def fetch_http(url: str, headers: Dict[str, str]) -> FetchResult:
+    """
+    Plain GET of the raw HTML, no JavaScript executed. Error statuses are
+    returned like any other response; only transport failures raise, and
+    without retries since the browser render is the fallback.
+    """
+    res = await http_client.get(
+        url, headers=headers, retries=0, timeout=HTTP_FETCH_TIMEOUT
+    )
+    return FetchResult(
+        html=res.text,
+        headers=dict(res.headers),
+        status_code=res.status_code,
+        final_url=str(res.url),
+    )
+
+
+async def fetch_rendered(url: str, headers: Dict[str, str]) -> FetchResult:
+    """Loads the page in a pooled headless Chromium and returns the live DOM."""
+    async with browser_pool.page(
+        user_agent=headers.get("User-Agent"), extra_http_headers=headers
+    ) as page:
+        response = await page.goto(
+            url, timeout=RENDER_TIMEOUT_MS, wait_until="domcontentloaded"
+        )
+        html = await page.content()
+        return FetchResult(
+            html=html,
+            headers=response.headers if response else {},
+            status_code=response.status if response else None,
+            final_url=page.url,
+            rendered=True,
+        )
+
+
+async def fetch_page(url: str, headers: Dict[str, str]) -> FetchResult:
+    """
+    Tiered fetch: try a cheap HTTP GET first and only escalate to a headless
+    render when the markup looks client-rendered. The decision is remembered
+    per host so repeat audits of a JS-only site go straight to the browser.
+    Error statuses and non-HTML responses come back as-is from the GET.
+    """
+    host = urlparse(url).netloc.lower()
+    known = render_decisions.get(host)
+
+    http_result = None
+    if known is not True:
+        try:
+            http_result = await fetch_http(url, headers)
+        except Exception as e:
+            # Nothing learned about the host, so nothing is remembered
+            print(f"⚠️ HTTP fetch failed, escalating to browser: {e}")
+        else:
+            content_type = http_result.headers.get("content-type", "")
+            is_html = not content_type or "html" in content_type
+            if not 200 <= http_result.status_code < 300 or not is_html:
+                return http_result  # a 404 or a PDF says nothing about JS
+            if known is False or not needs_js_rendering(http_result.html):
+                render_decisions.set(host, False)
+                return http_result
+
+    try:
+        rendered = await fetch_rendered(url, headers)
+    except Exception as e:
+        # A thin static page still beats no page at all
+        print(f"⚠️ Playwright failed, falling back to raw HTML: {e}")
+        if http_result is not None:
+            return http_result
+        if known is True:  # the probe was skipped, so try it now
+            return await fetch_http(url, headers)
+        raise
+
+    if http_result is not None:
+        # Only a successful HTML probe that looked client-rendered pins the
+        # host to the browser
+        render_decisions.set(host, True)
+    return rendered
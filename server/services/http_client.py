@@ -0,0 +1,136 @@
+import asyncio
+import os
+import random
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Config ---
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "50"))
+HTTP_MAX_PER_HOST = int(os.getenv("HTTP_MAX_PER_HOST", "8"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_BACKOFF_BASE = float(os.getenv("HTTP_BACKOFF_BASE", "0.3"))
+HTTP_BACKOFF_MAX = float(os.getenv("HTTP_BACKOFF_MAX", "5"))
+
+# Responses worth retrying; everything else is returned to the caller as-is
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# Failures where the request never reached the server. Read timeouts are
+# not retried: a slow endpoint would just be waited on again.
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class HostLimiter:
+    """Per-host semaphores that are dropped again once a host goes idle."""
+
+    def __init__(self, per_host: int):
+        self.per_host = per_host
+        self._hosts: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        limit, users = self._hosts.get(host, (None, 0))
+        if limit is None:
+            limit = asyncio.Semaphore(self.per_host)
+        self._hosts[host] = (limit, users + 1)
+        try:
+            async with limit:
+                yield
+        finally:
+            limit, users = self._hosts[host]
+            if users == 1:
+                del self._hosts[host]
+            else:
+                self._hosts[host] = (limit, users - 1)
+
+
+_client: Optional[httpx.AsyncClient] = None
+_host_limiter = HostLimiter(HTTP_MAX_PER_HOST)
+
+
+def _build_client() -> httpx.AsyncClient:
+    try:
+        import h2  # noqa: F401  (HTTP/2 support is optional)
+
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        follow_redirects=True,
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+        ),
+    )
+
+
+async def start_http_client():
+    """Creates the shared client. Called once from the app startup hook."""
+    global _client
+    if _client is None:
+        _client = _build_client()
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        # Fallback for scripts/tests that never ran the startup hook
+        _client = _build_client()
+    return _client
+
+
+def _backoff(attempt: int) -> float:
+    # "Full jitter": random delay up to the exponential cap
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2**attempt))
+
+
+async def request(
+    method: str, url: str, retries: int = HTTP_RETRIES, **kwargs
+) -> httpx.Response:
+    """
+    Sends a request through the shared pooled client. Connection failures
+    and 429/5xx gateway responses are retried with jittered
+    exponential backoff; at most HTTP_MAX_PER_HOST requests run against the
+    same host at once.
+    """
+    client = get_http_client()
+    attempt = 0
+    while True:
+        try:
+            async with _host_limiter.slot(urlparse(url).netloc.lower()):
+                res = await client.request(method, url, **kwargs)
+            if res.status_code not in RETRY_STATUS_CODES or attempt >= retries:
+                return res
+            retry_after = res.headers.get("retry-after")
+            delay = (
+                min(float(retry_after), HTTP_BACKOFF_MAX)
+                if retry_after and retry_after.isdigit()
+                else _backoff(attempt)
+            )
+        except RETRY_ERRORS:
+            if attempt >= retries:
+                raise
+            delay = _backoff(attempt)
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def get(url: str, **kwargs) -> httpx.Response:
+    return await request("GET", url, **kwargs)
@@ -0,0 +1,206 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from database import (
+    claim_job,
+    create_job,
+    fail_abandoned_jobs,
+    finish_job,
+    get_job,
+    release_jobs,
+    update_job_progress,
+)
+from dotenv import load_dotenv
+
+from services.analysis_cache import analyze_url_cached
+from services.report_writer import report_writer
+
+load_dotenv()
+
+# --- Config ---
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Idle workers re-check MongoDB this often for jobs queued by other processes
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "2"))
+# A job whose worker hasn't reported progress for this long is assumed
+# abandoned (its process died) and is claimed again; every stage event
+# renews the lease, so keep it well above the slowest single stage
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RESULT_TTL_HOURS = int(os.getenv("JOB_RESULT_TTL_HOURS", "24"))
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class JobQueue:
+    """
+    Analysis jobs backed by MongoDB. submit() only inserts a queued job; a
+    fixed pool of worker tasks claims jobs atomically (so several processes
+    can share the queue), runs the analysis pipeline and records per-stage
+    progress and the final result on the job document. Jobs left running by
+    a crashed process are picked up again once their lease expires.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        self.workers = workers
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._watchers: Dict[str, Set[asyncio.Event]] = {}
+
+    def start(self):
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._reap()))
+
+    async def stop(self):
+        """Stops the workers and hands their unfinished jobs back to the queue."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            released = await release_jobs(self.worker_id)
+            if released:
+                print(f"↩️ Re-queued {released} unfinished analysis job(s).")
+        except Exception as e:
+            print(f"⚠️ Could not re-queue running jobs: {e}")
+
+    async def submit(
+        self, user_id: Optional[str], url: str, bypass_cache: bool = False
+    ) -> str:
+        job_id = uuid.uuid4().hex  # unguessable: anonymous jobs are readable by id
+        await create_job(job_id, user_id, url, {"bypass_cache": bypass_cache})
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job_id
+
+    async def watch(self, job_id: str) -> AsyncIterator[dict]:
+        """
+        Yields the job document whenever it changes (None after a poll that
+        found no change, so callers can send keep-alives), ending once the
+        job is done or failed. Local workers wake watchers immediately; jobs
+        run by another process are noticed within JOB_POLL_SECONDS.
+        """
+        changed = asyncio.Event()
+        self._watchers.setdefault(job_id, set()).add(changed)
+        try:
+            last = None
+            while True:
+                changed.clear()
+                job = await get_job(job_id)
+                if job is None:
+                    return
+                if job != last:
+                    yield job
+                    last = job
+                else:
+                    yield None
+                if job["status"] in TERMINAL_STATUSES:
+                    return
+                try:
+                    await asyncio.wait_for(changed.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            watchers = self._watchers.get(job_id)
+            if watchers is not None:
+                watchers.discard(changed)
+                if not watchers:
+                    del self._watchers[job_id]
+
+    def _notify(self, job_id: str):
+        for changed in self._watchers.get(job_id, ()):
+            changed.set()
+
+    async def _work(self):
+        while True:
+            try:
+                job = await claim_job(self.worker_id, JOB_LEASE_SECONDS, JOB_MAX_ATTEMPTS)
+            except Exception as e:
+                print(f"⚠️ Could not claim analysis job: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            self._notify(job["_id"])
+            await self._run(job)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(60)
+            try:
+                await fail_abandoned_jobs(JOB_MAX_ATTEMPTS, self._expires_at())
+            except Exception as e:
+                print(f"⚠️ Could not fail abandoned jobs: {e}")
+
+    @staticmethod
+    def _expires_at() -> datetime:
+        return datetime.utcnow() + timedelta(hours=JOB_RESULT_TTL_HOURS)
+
+    async def _save_progress(self, job_id: str, progress: dict, lock: asyncio.Lock):
+        # The lock keeps writes in stage-event order
+        async with lock:
+            try:
+                await update_job_progress(
+                    job_id, self.worker_id, progress, JOB_LEASE_SECONDS
+                )
+            except Exception as e:
+                print(f"⚠️ Could not save progress for job {job_id}: {e}")
+        self._notify(job_id)
+
+    async def _run(self, job: dict):
+        job_id = job["_id"]
+        progress: Dict[str, dict] = {}
+        lock = asyncio.Lock()
+        writes: List[asyncio.Future] = []
+
+        def on_stage(stage: str, status: str, elapsed_ms: Optional[float]):
+            progress[stage] = {"status": status, "ms": elapsed_ms}
+            writes.append(
+                asyncio.ensure_future(self._save_progress(job_id, dict(progress), lock))
+            )
+
+        try:
+            result, cache_info = await analyze_url_cached(
+                job["url"],
+                bypass_cache=job.get("options", {}).get("bypass_cache", False),
+                on_stage=on_stage,
+            )
+        except Exception as e:
+            result, cache_info = {"error": str(e)}, None
+        await asyncio.gather(*writes, return_exceptions=True)
+
+        try:
+            if result.get("error"):
+                await finish_job(
+                    job_id, self.worker_id, "failed", self._expires_at(), error=result["error"]
+                )
+            else:
+                finished = await finish_job(
+                    job_id,
+                    self.worker_id,
+                    "done",
+                    self._expires_at(),
+                    result={**result, "cache": cache_info},
+                )
+                # Only once the result is saved: a job that gets retried (or
+                # that another worker took over) must not store a report twice
+                if finished and job.get("user_id"):
+                    await report_writer.submit(job["user_id"], job["url"], result)
+        except Exception as e:
+            # Lease runs out and another worker retries the job
+            print(f"⚠️ Could not record result of job {job_id}: {e}")
+        self._notify(job_id)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,82 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from services.extractor import extract_page
+
+load_dotenv()
+
+# --- Config ---
+# Number of parser processes; 0 keeps parsing on the event loop thread
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+# Pages smaller than this are parsed inline; shipping them to a worker
+# costs more than parsing them
+PARSE_INLINE_MAX_KB = int(os.getenv("PARSE_INLINE_MAX_KB", "64"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _init_worker():
+    """Runs once per worker process so the first real job doesn't pay for imports."""
+    import bs4  # noqa: F401
+    import services.extractor  # noqa: F401
+
+    try:
+        import lxml.etree  # noqa: F401
+    except ImportError:
+        pass
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def start_parse_pool():
+    """Creates the worker pool and warms every process. Called at startup."""
+    global _executor
+    if _executor is not None or PARSE_WORKERS <= 0:
+        return
+    _executor = ProcessPoolExecutor(
+        max_workers=PARSE_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+    # Executors spawn lazily; submitting one job per worker starts them all now
+    for _ in range(PARSE_WORKERS):
+        _executor.submit(_ping)
+    print(f"🧮 Parse pool started with {PARSE_WORKERS} worker(s).")
+
+
+def stop_parse_pool():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def extract_in_pool(html: bytes, base_url: str) -> dict:
+    """
+    Runs extract_page in a worker process and returns its compact result,
+    leaving the event loop free to serve I/O meanwhile.
+    """
+    if _executor is None or len(html) <= PARSE_INLINE_MAX_KB * 1024:
+        return extract_page(html, base_url)
+
+    executor = _executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(executor, extract_page, html, base_url)
+    except BrokenProcessPool:
+        # A worker died, most likely on this very page (e.g. OOM), so it is
+        # not retried inline. Only the first caller to notice rebuilds the
+        # pool; later ones would tear down its fresh replacement.
+        if _executor is executor:
+            print("⚠️ Parse pool broken, restarting.")
+            stop_parse_pool()
+            start_parse_pool()
+        raise RuntimeError("Page could not be parsed: parser process died")
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass(frozen=True)
+class Stage:
+    """
+    One step of a pipeline. `func` receives the shared context dict, which
+    holds the pipeline inputs plus the result of every finished stage keyed
+    by stage name; whatever it returns is stored under `name`.
+    """
+
+    name: str
+    func: Callable[[Dict[str, Any]], Awaitable[Any]]
+    deps: Tuple[str, ...] = ()
+
+
+# on_stage(stage_name, status, elapsed_ms): status is "started", "done" or
+# "failed"; elapsed_ms is None for "started"
+StageCallback = Callable[[str, str, Optional[float]], None]
+
+
+class StageError(Exception):
+    """Raised by Pipeline.run when a stage fails; keeps the stage name."""
+
+    def __init__(self, stage: str, error: BaseException):
+        super().__init__(f"{stage}: {error}")
+        self.stage = stage
+        self.error = error
+
+
+class Pipeline:
+    """
+    A small DAG scheduler: every stage starts as soon as all of its
+    dependencies are done, so independent branches run concurrently.
+    """
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages = self._topological_order(stages)
+
+    @staticmethod
+    def _topological_order(stages: Sequence[Stage]) -> List[Stage]:
+        by_name = {}
+        for stage in stages:
+            if stage.name in by_name:
+                raise ValueError(f"Duplicate stage '{stage.name}'")
+            by_name[stage.name] = stage
+
+        ordered, done, visiting = [], set(), set()
+
+        def visit(stage: Stage):
+            if stage.name in done:
+                return
+            if stage.name in visiting:
+                raise ValueError(f"Cycle in pipeline at stage '{stage.name}'")
+            visiting.add(stage.name)
+            for dep in stage.deps:
+                if dep not in by_name:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown '{dep}'")
+                visit(by_name[dep])
+            visiting.discard(stage.name)
+            done.add(stage.name)
+            ordered.append(stage)
+
+        for stage in stages:
+            visit(stage)
+        return ordered
+
+    async def run(
+        self, ctx: Dict[str, Any], on_stage: Optional[StageCallback] = None
+    ) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """
+        Runs every stage and returns (ctx, timings) where timings maps each
+        stage name to its own wall time in milliseconds. If any stage fails
+        the remaining stages are cancelled and a StageError is raised.
+        `on_stage` is called as each stage starts and finishes.
+        """
+        notify = on_stage or (lambda *_: None)
+        timings: Dict[str, float] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(stage: Stage):
+            if stage.deps:
+                await asyncio.gather(*(tasks[dep] for dep in stage.deps))
+            start = time.perf_counter()
+            notify(stage.name, "started", None)
+            try:
+                ctx[stage.name] = await stage.func(ctx)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                timings[stage.name] = round((time.perf_counter() - start) * 1000, 1)
+                notify(stage.name, "failed", timings[stage.name])
+                raise StageError(stage.name, e) from e
+            timings[stage.name] = round((time.perf_counter() - start) * 1000, 1)
+            notify(stage.name, "done", timings[stage.name])
+
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        return ctx, timings
@@ -0,0 +1,140 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from database import apply_report_stats, build_report_document, insert_reports
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Config ---
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "50"))
+REPORT_FLUSH_INTERVAL = float(os.getenv("REPORT_FLUSH_INTERVAL", "1.0"))
+# Once this many reports are waiting, submit() blocks until a flush makes room
+REPORT_BUFFER_MAX = int(os.getenv("REPORT_BUFFER_MAX", "5000"))
+REPORT_FLUSH_RETRIES = 3
+
+_Pending = Tuple[str, str, dict, datetime]
+
+
+class ReportWriter:
+    """
+    Write-behind buffer for report persistence. Requests hand their report
+    over and return immediately; a background task batches everything that
+    arrived into one insert_many + one rollup bulk_write, flushing whenever
+    REPORT_BATCH_SIZE reports are waiting or REPORT_FLUSH_INTERVAL passes.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = REPORT_BATCH_SIZE,
+        flush_interval: float = REPORT_FLUSH_INTERVAL,
+        max_pending: int = REPORT_BUFFER_MAX,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Future] = None
+        # Reports taken off the queue for the batch being collected; kept on
+        # the instance so stop() can still write them
+        self._pending: List[_Pending] = []
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stops the flusher and writes out everything still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._flushing is not None:
+            # Let a batch that was mid-write finish
+            await asyncio.gather(self._flushing, return_exceptions=True)
+        pending, self._pending = self._pending, []
+        await self._flush(pending)
+        while not self._queue.empty():
+            await self._flush(self._take_batch())
+
+    async def submit(self, user_id: str, url: str, data: dict):
+        """Queues a report. Waits only when the buffer is full (backpressure)."""
+        if self._task is None:
+            # Not started (scripts/tests): write through synchronously
+            await self._flush([(user_id, url, data, datetime.utcnow())])
+            return
+        await self._queue.put((user_id, url, data, datetime.utcnow()))
+
+    def _take_batch(self) -> List[_Pending]:
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            # Sleep until the first report arrives, then give the batch up to
+            # flush_interval to fill before writing it
+            self._pending.append(await self._queue.get())
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._pending.append(
+                        await asyncio.wait_for(self._queue.get(), timeout)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            batch, self._pending = self._pending, []
+            # Shielded so shutdown can't cut a batch off half-written
+            self._flushing = asyncio.ensure_future(self._flush(batch))
+            await asyncio.shield(self._flushing)
+            self._flushing = None
+
+    async def _flush(self, batch: List[_Pending]):
+        if not batch:
+            return
+        try:
+            # Built once so a retried write reuses the same _ids
+            reports = [
+                await build_report_document(user_id, url, data, created_at)
+                for user_id, url, data, created_at in batch
+            ]
+        except Exception as e:
+            print(f"❌ Dropping {len(batch)} report(s), could not build them: {e}")
+            return
+
+        # The two steps are retried separately (and each is idempotent), so
+        # a failing rollup write never re-inserts or drops stored reports
+        if not await self._retry("insert", lambda: insert_reports(reports)):
+            print(f"❌ Dropping {len(batch)} report(s) after {REPORT_FLUSH_RETRIES} attempts.")
+            return
+        if not await self._retry("rollup", lambda: apply_report_stats(reports)):
+            print(
+                f"❌ Rollups not updated for {len(batch)} saved report(s); "
+                "run backfill_stats.py to repair."
+            )
+
+    @staticmethod
+    async def _retry(step: str, write: Callable[[], Awaitable[None]]) -> bool:
+        for attempt in range(REPORT_FLUSH_RETRIES):
+            try:
+                await write()
+                return True
+            except Exception as e:
+                print(f"⚠️ Report {step} failed (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(0.5 * 2**attempt)
+        return False
+
+
+report_writer = ReportWriter()
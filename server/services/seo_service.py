@@ -1,13 +1,15 @@
 import asyncio
 import os
-from urllib.parse import urljoin, urlparse
+from typing import Optional
 
 # ✨ 1. Import the new library standard
 import google.generativeai as genai
-import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from playwright.async_api import async_playwright
+
+from services import http_client
+from services.fetcher import fetch_page
+from services.parse_pool import extract_in_pool
+from services.pipeline import Pipeline, Stage, StageCallback, StageError
 
 # Removed: from google.genai import types (no longer needed for this model)
 
@@ -35,11 +37,14 @@ def analyze_keyword(keyword: str):
 # -------------------------------------------------
 # Google PageSpeed Insights (Unchanged)
 # -------------------------------------------------
-def get_pagespeed_insights(url: str, strategy: str = "desktop"):
+async def get_pagespeed_insights(url: str, strategy: str = "desktop"):
     endpoint = "https://www.googleapis.com/pagespeedonline/v5/runPagespeed"
     params = {"url": url, "strategy": strategy, "key": GOOGLE_API_KEY}
     try:
-        res = requests.get(endpoint, params=params, timeout=15)
+        # Awaited on the shared async client so a slow PageSpeed run doesn't
+        # block the event loop for every other request. Not retried: a slow
+        # run would only be repeated, stretching the whole analysis.
+        res = await http_client.get(endpoint, params=params, retries=0, timeout=15)
         data = res.json()
         lighthouse = data.get("lighthouseResult", {}).get("categories", {})
         return {
@@ -59,182 +64,176 @@ def get_pagespeed_insights(url: str, strategy: str = "desktop"):
 
 
 # -------------------------------------------------
-# URL SEO Analysis (Original Content - Unchanged)
+# URL SEO Analysis (staged pipeline)
 # -------------------------------------------------
-async def analyze_url(url: str):
-    # ✅ Normalize URL
-    if not url.startswith(("http://", "https://")):
-        url = "https://" + url
+REQUEST_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/127.0.0.1 Safari/537.36"
+    )
+}
 
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/127.0.0.1 Safari/537.36"
-        )
+# How many discovered links get a liveness check (0 disables the stage)
+LINK_CHECK_LIMIT = int(os.getenv("LINK_CHECK_LIMIT", "25"))
+LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "8"))
+LINK_CHECK_TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", "5"))
+# Wall-clock budget for the whole stage; links still unchecked by then are
+# left out rather than holding up the analysis
+LINK_CHECK_DEADLINE = float(os.getenv("LINK_CHECK_DEADLINE", "4"))
+
+
+def _error_result(error: str) -> dict:
+    return {
+        "title": "Error fetching URL",
+        "metaTags": {},
+        "headings": {},
+        "content": {},
+        "links": {
+            "internal": [],
+            "external": [],
+            "broken": [],
+            "nofollow": [],
+            "mailto": [],
+            "tel": [],
+        },
+        "structured_data": [],
+        "google_scores": {},
+        "score": 0,
+        "keywords": [],
+        "error": error,
     }
 
-    html = None
-    response_headers = {}
 
-    try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True, args=["--no-sandbox"])
-            page = await browser.new_page()
-            await page.set_extra_http_headers(headers)
-            await page.goto(url, timeout=30000, wait_until="domcontentloaded")
-            html = await page.content()
-            if page.response:
-                response_headers = page.response.headers
-            await browser.close()
+async def _fetch_stage(ctx: dict):
+    # Static pages are served from a plain HTTP GET; Chromium is only
+    # used when the markup needs JavaScript to render.
+    return await fetch_page(ctx["url"], REQUEST_HEADERS)
 
-    except Exception as e:
-        print(f"⚠️ Playwright failed: {e}")
-        try:
-            res = requests.get(url, headers=headers, timeout=10)
-            res.raise_for_status()
-            html = res.text
-            response_headers = res.headers
-        except Exception as e2:
-            print(f"❌ Both Playwright and requests failed: {e2}")
-            return {
-                "title": "Error fetching URL",
-                "metaTags": {},
-                "headings": {},
-                "content": {},
-                "links": {
-                    "internal": [],
-                    "external": [],
-                    "broken": [],
-                    "nofollow": [],
-                    "mailto": [],
-                    "tel": [],
-                },
-                "structured_data": [],
-                "google_scores": {},
-                "score": 0,
-                "keywords": [],
-                "error": str(e2),
-            }
-
-    soup = BeautifulSoup(html, "html.parser")
-    title = soup.title.string.strip() if soup.title else "No Title"
-    meta_desc = soup.find("meta", attrs={"name": "description"})
-    description = (
-        meta_desc.get("content").strip()
-        if meta_desc and meta_desc.get("content")
-        else None
-    )
-    meta_kw = soup.find("meta", attrs={"name": "keywords"})
-    keywords = (
-        [kw.strip() for kw in meta_kw.get("content", "").split(",") if kw]
-        if meta_kw
-        else []
-    )
-    canonical_tag = soup.find("link", rel="canonical")
-    canonical = canonical_tag.get("href") if canonical_tag else None
-    robots_tag = soup.find("meta", attrs={"name": "robots"})
-    robots_content = (
-        robots_tag.get("content").lower()
-        if robots_tag and robots_tag.get("content")
-        else None
-    )
-    favicon_tag = soup.find("link", rel="icon")
-    favicon = (
-        urljoin(url, favicon_tag.get("href"))
-        if favicon_tag and favicon_tag.get("href")
-        else None
-    )
-    headings = {
-        f"h{i}": [h.get_text(strip=True) for h in soup.find_all(f"h{i}")]
-        for i in range(1, 7)
-    }
-    all_text = soup.get_text()
-    word_count = len(all_text.split())
-    paragraph_count = len(soup.find_all("p"))
-    image_tags = soup.find_all("img")
-    image_count = len(image_tags)
-    images_without_alt = [img.get("src") for img in image_tags if not img.get("alt")]
-    images_missing_dimensions = [
-        img.get("src")
-        for img in image_tags
-        if not img.get("width") or not img.get("height")
-    ]
-    images_long_names = [
-        img.get("src")
-        for img in image_tags
-        if img.get("src") and len(img.get("src")) > 50
-    ]
-    all_links = [a.get("href") for a in soup.find_all("a", href=True)]
-    parsed_url = urlparse(url)
-    internal, external, nofollow, mailto, tel = [], [], [], [], []
-
-    for a_tag in soup.find_all("a", href=True):
-        link = a_tag["href"]
-        abs_url = urljoin(url, link)
-
-        if abs_url.startswith("mailto:"):
-            mailto.append(abs_url)
-        elif abs_url.startswith("tel:"):
-            tel.append(abs_url)
-        elif parsed_url.netloc in abs_url:
-            internal.append(abs_url)
-        else:
-            external.append(abs_url)
-
-        if a_tag.get("rel") and "nofollow" in a_tag.get("rel"):
-            nofollow.append(abs_url)
-
-    structured_data = [
-        script.get_text()
-        for script in soup.find_all("script", attrs={"type": "application/ld+json"})
-    ]
 
-    page_size = len(html.encode("utf-8")) / 1024
-    performance_data = {
-        "page_size_kb": round(page_size, 2),
+async def _parse_stage(ctx: dict):
+    # One sweep over the markup fills every field (see services/extractor),
+    # run in a worker process so big pages don't stall the event loop
+    return await extract_in_pool(ctx["fetch"].html.encode("utf-8"), ctx["url"])
+
+
+async def _extract_stage(ctx: dict):
+    url = ctx["url"]
+    response_headers = ctx["fetch"].headers
+    result = dict(ctx["parse"])
+
+    result["performance"] = {
+        "page_size_kb": result.pop("page_size_kb"),
         "https": url.startswith("https"),
         "gzip_enabled": response_headers.get("content-encoding") == "gzip",
         "cache_control": response_headers.get("cache-control"),
         "expires": response_headers.get("expires"),
     }
+    return result
 
-    google_scores = get_pagespeed_insights(url, "desktop")
-    score = 80 if description and len(description) > 50 else 50
 
-    return {
-        "title": title,
-        "metaTags": {
-            "description": description,
-            "keywords": ", ".join(keywords) if keywords else None,
-            "robots": robots_content,
-            "canonical": canonical,
-            "favicon": favicon,
-        },
-        "headings": headings,
-        "content": {
-            "word_count": word_count,
-            "paragraph_count": paragraph_count,
-            "image_count": image_count,
-            "images_without_alt": images_without_alt,
-            "images_missing_dimensions": images_missing_dimensions,
-            "images_long_names": images_long_names,
-        },
-        "links": {
-            "internal": list(set(internal)),
-            "external": list(set(external)),
-            "broken": [],
-            "nofollow": list(set(nofollow)),
-            "mailto": list(set(mailto)),
-            "tel": list(set(tel)),
-        },
-        "performance": performance_data,
-        "structured_data": structured_data,
-        "google_scores": google_scores,
-        "score": score,
-        "keywords": keywords,
-        "error": None,
+async def _pagespeed_stage(ctx: dict):
+    # Only needs the URL, so it starts the moment the analysis does
+    return await get_pagespeed_insights(ctx["url"], "desktop")
+
+
+async def _is_broken(link: str, limit: asyncio.Semaphore) -> bool:
+    async with limit:
+        try:
+            res = await http_client.request(
+                "HEAD", link, retries=0, timeout=LINK_CHECK_TIMEOUT
+            )
+            if res.status_code == 405:  # some servers refuse HEAD
+                res = await http_client.get(link, retries=0, timeout=LINK_CHECK_TIMEOUT)
+            return res.status_code >= 400
+        except Exception:
+            return True
+
+
+async def _link_check_stage(ctx: dict):
+    links = ctx["extract"]["links"]
+    candidates = (links["internal"] + links["external"])[:LINK_CHECK_LIMIT]
+    if not candidates:
+        return []
+    limit = asyncio.Semaphore(LINK_CHECK_CONCURRENCY)
+    checks = {
+        link: asyncio.ensure_future(_is_broken(link, limit)) for link in candidates
     }
+    try:
+        await asyncio.wait(checks.values(), timeout=LINK_CHECK_DEADLINE)
+    finally:
+        for check in checks.values():
+            check.cancel()
+    return [
+        link
+        for link, check in checks.items()
+        if check.done() and not check.cancelled() and check.result()
+    ]
+
+
+async def _score_stage(ctx: dict):
+    description = ctx["extract"]["metaTags"]["description"]
+    return 80 if description and len(description) > 50 else 50
+
+
+ANALYZE_PIPELINE = Pipeline(
+    [
+        Stage("fetch", _fetch_stage),
+        Stage("parse", _parse_stage, ("fetch",)),
+        Stage("extract", _extract_stage, ("parse",)),
+        Stage("pagespeed", _pagespeed_stage),
+        Stage("link_checks", _link_check_stage, ("extract",)),
+        Stage("score", _score_stage, ("extract",)),
+    ]
+)
+
+
+async def analyze_url(url: str, on_stage: Optional[StageCallback] = None):
+    # ✅ Normalize URL
+    if not url.startswith(("http://", "https://")):
+        url = "https://" + url
+
+    try:
+        ctx, timings = await ANALYZE_PIPELINE.run({"url": url}, on_stage)
+    except StageError as e:
+        print(f"❌ Analysis failed in stage '{e.stage}': {e.error}")
+        return _error_result(str(e.error))
+
+    result = ctx["extract"]
+    result["links"]["broken"] = ctx["link_checks"]
+    result["google_scores"] = ctx["pagespeed"]
+    result["score"] = ctx["score"]
+    result["timings"] = timings
+    result["error"] = None
+    return result
+
+
+# Site crawls audit many pages of one site: no per-page PageSpeed call or
+# link HEAD checks (the crawl itself reports broken internal pages)
+CRAWL_PIPELINE = Pipeline(
+    [
+        Stage("fetch", _fetch_stage),
+        Stage("parse", _parse_stage, ("fetch",)),
+        Stage("extract", _extract_stage, ("parse",)),
+        Stage("score", _score_stage, ("extract",)),
+    ]
+)
+
+
+async def analyze_page(url: str):
+    """Lightweight analyze_url for crawled pages; adds status_code/final_url."""
+    try:
+        ctx, timings = await CRAWL_PIPELINE.run({"url": url})
+    except StageError as e:
+        return {**_error_result(str(e.error)), "status_code": None, "final_url": url}
+
+    result = ctx["extract"]
+    result["score"] = ctx["score"]
+    result["status_code"] = ctx["fetch"].status_code
+    result["final_url"] = ctx["fetch"].final_url or url
+    result["timings"] = timings
+    result["error"] = None
+    return result
 
 
 # -------------------------------------------------
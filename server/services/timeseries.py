@@ -0,0 +1,78 @@
+import re
+from typing import Dict, List
+
+import numpy as np
+
+# datetime64 unit used when labelling buckets of each resolution
+TIME_UNITS = {"minute": "m", "hour": "m", "day": "D"}
+
+_RANGE_RE = re.compile(r"^(\d+)([mhdwy])$")
+_RANGE_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400, "y": 365 * 86400}
+
+
+def parse_range(value: str) -> int:
+    """'90m', '24h', '7d', '12w', '1y' -> seconds. Raises ValueError."""
+    match = _RANGE_RE.match(value.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError(f"Invalid range '{value}'")
+    return int(match.group(1)) * _RANGE_SECONDS[match.group(2)]
+
+
+def format_times(epoch_seconds: np.ndarray, resolution: str) -> np.ndarray:
+    """Vectorised ISO labels for bucket start times (UTC)."""
+    return np.datetime_as_string(
+        np.asarray(epoch_seconds, dtype="datetime64[s]"), unit=TIME_UNITS[resolution]
+    )
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: indices of `threshold` points that keep
+    the visual shape of (x, y). First and last points are always kept.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # threshold - 2 buckets over the interior points [1, n - 1)
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            cx = x[end : edges[i + 2]].mean()
+            cy = y[end : edges[i + 2]].mean()
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs(
+            (x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a])
+        )
+        a = start + int(area.argmax())
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(x: np.ndarray, y: np.ndarray, points: int):
+    idx = lttb_indices(x, y, points)
+    return x[idx], y[idx]
+
+
+def to_points(times: np.ndarray, values: np.ndarray) -> List[Dict]:
+    """Arrays -> the [{time, value}] shape the dashboard charts expect."""
+    return [
+        {"time": t, "value": v} for t, v in zip(times.tolist(), values.tolist())
+    ]
+
+
+def build_series(
+    bucket_starts: np.ndarray, values: np.ndarray, resolution: str, points: int
+) -> List[Dict]:
+    """Downsamples one rollup column to `points` and labels it."""
+    x, y = downsample(bucket_starts, np.asarray(values, dtype=np.int64), points)
+    return to_points(format_times(x, resolution), y)
@@ -1,14 +1,29 @@
+import asyncio
+import hashlib
 import os
+import secrets
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from database import get_user_by_email, get_user_by_id
+from database import (
+    get_user_by_email,
+    get_user_by_id,
+    revoke_refresh_family,
+    save_refresh_token,
+    update_user_password_hash,
+    use_refresh_token,
+)
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
+from utils.revocation import revocation_list
+from utils.user_cache import cache_token_payload, get_token_payload, user_cache
 
 # Load .env variables
 load_dotenv()
@@ -16,10 +31,32 @@ load_dotenv()
 # --- Config ---
 SECRET_KEY = os.getenv("SECRET_KEY", "435768")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
 
 # --- Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Changing BCRYPT_ROUNDS marks older hashes as deprecated; they are
+# transparently re-hashed with the new cost on the user's next login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so hashing scales across these threads
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash jobs allowed to wait for a thread before new logins get a 503
+HASH_QUEUE_MAX = int(os.getenv("HASH_QUEUE_MAX", "64"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS
+)
+_hash_executor = ThreadPoolExecutor(
+    max_workers=HASH_WORKERS, thread_name_prefix="bcrypt"
+)
+_hash_jobs = 0  # running + queued jobs on _hash_executor
+
+# Simple timing counters per operation ("hash", "verify"); times include
+# the wait for a free thread
+hash_metrics: Dict[str, Dict[str, float]] = {
+    op: {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "rejected": 0}
+    for op in ("hash", "verify")
+}
 
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl="/users/login",
@@ -34,16 +71,87 @@ class TokenData(BaseModel):
 # --- Functions ---
 
 
-def verify_password(plain_password, hashed_password):
-    """Checks if a plain password matches a hashed one."""
-    return pwd_context.verify(plain_password, hashed_password)
+def get_hash_metrics() -> dict:
+    """Snapshot of the hashing pool counters, with the average per operation."""
+    return {
+        "workers": HASH_WORKERS,
+        "in_flight": _hash_jobs,
+        "operations": {
+            op: {
+                **metrics,
+                "avg_ms": metrics["total_ms"] / metrics["count"] if metrics["count"] else 0.0,
+            }
+            for op, metrics in hash_metrics.items()
+        },
+    }
+
 
+def _finish_hash_job(op: str, start: float):
+    global _hash_jobs
+    _hash_jobs -= 1
+    metrics = hash_metrics[op]
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    metrics["count"] += 1
+    metrics["total_ms"] += elapsed_ms
+    metrics["max_ms"] = max(metrics["max_ms"], elapsed_ms)
 
-def get_password_hash(password: str) -> str:
+
+async def _run_hash_job(op: str, fn, *args):
+    """Runs a bcrypt call on the bounded hashing pool, off the event loop."""
+    global _hash_jobs
+    if _hash_jobs >= HASH_WORKERS + HASH_QUEUE_MAX:
+        hash_metrics[op]["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy, please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    job = _hash_executor.submit(fn, *args)
+    _hash_jobs += 1
+    # Released (and timed) when the thread is done with the job, not when
+    # the request is: a cancelled request doesn't stop a running bcrypt call
+    job.add_done_callback(
+        lambda _: loop.call_soon_threadsafe(_finish_hash_job, op, start)
+    )
+    return await asyncio.wrap_future(job)
+
+
+def _truncate(password: str) -> bytes:
     # FIX: Truncate password to 72 bytes to prevent bcrypt ValueError
-    password_bytes = password.encode("utf-8")
-    truncated_password = password_bytes[:72]
-    return pwd_context.hash(truncated_password)
+    return password.encode("utf-8")[:72]
+
+
+async def verify_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """
+    Checks if a plain password matches a hashed one. Returns (valid, new_hash)
+    where new_hash is set when the stored hash used an outdated cost factor.
+    """
+    return await _run_hash_job(
+        "verify", pwd_context.verify_and_update, _truncate(plain_password), hashed_password
+    )
+
+
+async def get_password_hash(password: str) -> str:
+    return await _run_hash_job("hash", pwd_context.hash, _truncate(password))
+
+
+def build_token_claims(user: dict) -> dict:
+    """
+    Identity claims embedded in access tokens so authenticated requests can
+    be served without looking the user up.
+    """
+    return {
+        "sub": user["email"],
+        "uid": str(user["_id"]),
+        "name": user.get("username"),
+        "plan": user.get("plan", "Free"),
+        "onb": bool(user.get("isOnboarded", False)),
+    }
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -55,23 +163,105 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.now(timezone.utc) + timedelta(
             minutes=ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode.update({"exp": expire})
+    # jti lets a single access token be revoked (logout)
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-def authenticate_user(email: str, password: str) -> Optional[dict]:
+def _hash_refresh_token(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+
+async def issue_tokens(user: dict, family: Optional[str] = None) -> dict:
+    """
+    Creates a claims-bearing access token plus an opaque refresh token. All
+    refresh tokens descending from one login share a `family`.
+    """
+    refresh_token = secrets.token_urlsafe(32)
+    await save_refresh_token(
+        _hash_refresh_token(refresh_token),
+        str(user["_id"]),
+        family or uuid.uuid4().hex,
+        datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    return {
+        "access_token": create_access_token(build_token_claims(user)),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "isOnboarded": user.get("isOnboarded", False),
+    }
+
+
+async def rotate_refresh_token(refresh_token: str) -> Optional[dict]:
+    """
+    Exchanges a refresh token for a new token pair; the old refresh token
+    becomes unusable. Presenting an already-rotated token revokes its whole
+    family, since it means the token was copied. Returns None on failure.
+    """
+    status_, doc = await use_refresh_token(_hash_refresh_token(refresh_token))
+    if status_ == "reused":
+        await revoke_refresh_family(doc["family"])
+        return None
+    if status_ != "ok":
+        return None
+
+    # One read per refresh keeps plan/onboarding claims current
+    user = await get_user_by_id(str(doc["user_id"]))
+    if not user:
+        return None
+    return await issue_tokens(user, family=doc["family"])
+
+
+async def revoke_tokens(refresh_token: Optional[str], access_token: Optional[str]):
+    """Logout: kills the refresh token family and the current access token."""
+    if refresh_token:
+        status_, doc = await use_refresh_token(_hash_refresh_token(refresh_token))
+        if doc:
+            await revoke_refresh_family(doc["family"])
+    if access_token:
+        try:
+            payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
+        except JWTError:
+            return
+        if payload.get("jti"):
+            await revocation_list.revoke(
+                payload["jti"], datetime.utcfromtimestamp(payload["exp"])
+            )
+
+
+def _user_from_claims(payload: dict) -> dict:
+    return {
+        "_id": payload["uid"],
+        "email": payload["sub"],
+        "username": payload.get("name"),
+        "plan": payload.get("plan", "Free"),
+        "isOnboarded": payload.get("onb", False),
+    }
+
+
+async def authenticate_user(email: str, password: str) -> Optional[dict]:
     """Finds a user and verifies their password."""
-    user = get_user_by_email(email)
+    user = await get_user_by_email(email)
     if not user:
         return None
 
     # Safely check for 'hashed_password' to prevent KeyError
     hashed_password = user.get("hashed_password")
 
-    if not hashed_password or not verify_password(password, hashed_password):
+    if not hashed_password:
+        return None
+
+    valid, new_hash = await verify_password(password, hashed_password)
+    if not valid:
         return None
 
+    if new_hash:
+        # Cost factor changed since this hash was made: upgrade it in place
+        await update_user_password_hash(user["_id"], new_hash)
+        user["hashed_password"] = new_hash
+
     return user
 
 
@@ -88,19 +278,33 @@ async def get_current_user(
         return None
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        # 'sub' (subject) of the token is the user's email
+        # Decoded payloads are cached per token until it expires
+        payload = get_token_payload(token)
+        if payload is None:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            cache_token_payload(token, payload)
+        if revocation_list.is_revoked(payload.get("jti")):
+            return None
+
+        # Claims-bearing tokens carry everything routes need: no DB read
+        if "uid" in payload and "sub" in payload:
+            return _user_from_claims(payload)
+
+        # Older tokens only carry 'sub' (subject), the user's email
         email: str = payload.get("sub")
 
         if email is None:
             # Malformed payload
             return None
 
-        # Uses the imported function
-        user = get_user_by_email(email)
+        # Served from the short-lived user cache when possible
+        user = user_cache.get(email)
         if user is None:
-            # User deleted since token creation
-            return None
+            user = await get_user_by_email(email)
+            if user is None:
+                # User deleted since token creation
+                return None
+            user_cache.set(email, user)
 
         # If successful, return the user dictionary
         return user
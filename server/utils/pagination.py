@@ -0,0 +1,36 @@
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+from bson import ObjectId
+
+
+def encode_cursor(created_at: datetime, doc_id) -> str:
+    """Opaque keyset cursor for the (created_at, _id) sort order."""
+    raw = f"{created_at.isoformat()}|{doc_id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, ObjectId]]:
+    """Returns (created_at, _id) or raises ValueError for a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, doc_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_filter(after: Optional[Tuple[datetime, ObjectId]]) -> dict:
+    """Mongo filter for documents strictly after `after` in newest-first order."""
+    if after is None:
+        return {}
+    created_at, doc_id = after
+    return {
+        "$or": [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": doc_id}},
+        ]
+    }
@@ -0,0 +1,64 @@
+import json
+import zlib
+from typing import Optional, Tuple
+
+try:
+    import zstandard  # optional: better ratio and faster than zlib
+except ImportError:
+    zstandard = None
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 10
+
+
+def default_codec() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def compress_detail(data: dict, codec: Optional[str] = None) -> Tuple[bytes, str]:
+    """Serializes a full analysis result to compact compressed bytes."""
+    codec = codec or default_codec()
+    raw = json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), codec
+    return zlib.compress(raw, ZLIB_LEVEL), "zlib"
+
+
+def decompress_detail(blob: bytes, codec: str) -> dict:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Report was stored with zstd but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        raw = zlib.decompress(blob)
+    return json.loads(raw)
+
+
+def summarize_report(data: dict) -> dict:
+    """
+    The small, always-loaded part of a report: scores, title, meta tags and
+    counts. Everything unbounded (link lists, JSON-LD, image lists) stays in
+    the compressed detail.
+    """
+    content = data.get("content") or {}
+    links = data.get("links") or {}
+    headings = data.get("headings") or {}
+    return {
+        "title": data.get("title"),
+        "score": data.get("score"),
+        "metaTags": data.get("metaTags"),
+        "google_scores": data.get("google_scores"),
+        "performance": data.get("performance"),
+        "counts": {
+            "word_count": content.get("word_count"),
+            "paragraph_count": content.get("paragraph_count"),
+            "image_count": content.get("image_count"),
+            "images_without_alt": len(content.get("images_without_alt") or []),
+            "images_missing_dimensions": len(
+                content.get("images_missing_dimensions") or []
+            ),
+            "headings": {tag: len(items or []) for tag, items in headings.items()},
+            "links": {kind: len(items or []) for kind, items in links.items()},
+            "structured_data": len(data.get("structured_data") or []),
+        },
+    }
@@ -0,0 +1,68 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from database import add_revoked_token, get_revoked_token_ids
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# --- Config ---
+REVOCATION_SYNC_SECONDS = int(os.getenv("REVOCATION_SYNC_SECONDS", "30"))
+
+
+class RevocationList:
+    """
+    In-memory set of revoked access-token ids (jti). Local revocations apply
+    immediately; revocations made by other workers are picked up by a
+    periodic sync from MongoDB, so checking a token never needs a DB read.
+    """
+
+    def __init__(self, sync_seconds: int = REVOCATION_SYNC_SECONDS):
+        self.sync_seconds = sync_seconds
+        self._revoked: Set[str] = set()
+        # Revoked by this worker: kept until expiry so a sync that raced the
+        # DB write can't drop them
+        self._local: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, jti: Optional[str]) -> bool:
+        return jti is not None and jti in self._revoked
+
+    async def revoke(self, jti: str, expires_at: datetime):
+        self._revoked.add(jti)
+        self._local[jti] = expires_at
+        await add_revoked_token(jti, expires_at)
+
+    async def sync(self):
+        try:
+            revoked = await get_revoked_token_ids()
+        except Exception as e:
+            print(f"⚠️ Revocation sync failed: {e}")
+            return
+        now = datetime.utcnow()
+        self._local = {jti: exp for jti, exp in self._local.items() if exp > now}
+        # Replacing the set also forgets tokens that have since expired
+        self._revoked = revoked | set(self._local)
+
+    async def _run(self):
+        while True:
+            await self.sync()
+            await asyncio.sleep(self.sync_seconds)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,50 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """
+    A small in-process LRU cache whose entries also expire after `ttl`
+    seconds. Not thread-safe; meant to be used from the event loop.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, float, Any]]" = OrderedDict()
+
+    def get_entry(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Returns (value, stored_at) or None when missing/expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, stored_at, value = entry
+        if time.time() >= expires_at:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value, stored_at
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.get_entry(key)
+        return entry[0] if entry else default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        self._data[key] = (now + (self.ttl if ttl is None else ttl), now, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get_entry(key) is not None
@@ -0,0 +1,41 @@
+import hashlib
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+from utils.ttl_cache import TTLCache
+
+load_dotenv()
+
+# --- Config ---
+# Short TTL: other workers' writes become visible within this window
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX = int(os.getenv("USER_CACHE_MAX", "10000"))
+TOKEN_CACHE_MAX = int(os.getenv("TOKEN_CACHE_MAX", "10000"))
+
+# Users keyed by token subject (email)
+user_cache = TTLCache(max_size=USER_CACHE_MAX, ttl=USER_CACHE_TTL)
+# Decoded JWT payloads keyed by token hash, kept until the token expires
+token_cache = TTLCache(max_size=TOKEN_CACHE_MAX, ttl=USER_CACHE_TTL)
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def cache_token_payload(token: str, payload: dict):
+    exp = payload.get("exp")
+    ttl = exp - time.time() if isinstance(exp, (int, float)) else USER_CACHE_TTL
+    if ttl > 0:
+        token_cache.set(token_key(token), payload, ttl=ttl)
+
+
+def get_token_payload(token: str) -> Optional[dict]:
+    return token_cache.get(token_key(token))
+
+
+def invalidate_user(email: Optional[str]):
+    """Drops a cached user; call after any write to that user's document."""
+    if email:
+        user_cache.delete(email)